@@ -0,0 +1,112 @@
+# The age structure stage as update() used to build it (two groupbys over the
+# same keys, the second carrying the attributes with "first", and a merge of
+# the totals) against data.age_structure(), time and peak allocations.
+# Run from the repository root:
+#   python -m benchmarks.age_structure [municipalities] [years]
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from nordgeo.data import age_group, age_structure
+
+
+def synthetic(municipalities, years):
+    # the frames update() passes to the stage: attributes per municipality and
+    # single-year counts from age_counts()
+    rng = np.random.default_rng(0)
+    ids = np.arange(municipalities, dtype="int16")
+    mun = pd.DataFrame(
+        {
+            "municipality id": ids,
+            "lat": rng.uniform(54, 70, municipalities),
+            "lon": rng.uniform(5, 30, municipalities),
+            "MUN_NORDIC": [f"Municipality {i}" for i in ids],
+            "REG_NORDIC": [f"Region {i // 20}" for i in ids],
+            "CNTR": rng.choice(["DK", "SE", "NO", "FI", "IS"], municipalities),
+        }
+    )
+    ages = pd.DataFrame(
+        {
+            "municipality id": np.repeat(ids, 101 * years),
+            "age": np.tile(np.arange(101, dtype="int16"), municipalities * years),
+            "year": np.tile(
+                np.repeat([str(2023 - years + i) for i in range(years)], 101),
+                municipalities,
+            ),
+        }
+    )
+    ages["value"] = rng.integers(0, 500, len(ages))
+    return mun, ages
+
+
+def age_structure_three_pass(mun, ages):
+    ages = ages.assign(**{"age group": age_group(ages["age"])})
+    gcr_age = (
+        ages.groupby(["municipality id", "year", "age group"], observed=True)
+        .agg({"value": "sum"})
+        .reset_index()
+    )
+    gcr_age = pd.merge(
+        gcr_age,
+        mun[["municipality id", "lat", "lon", "MUN_NORDIC", "REG_NORDIC", "CNTR"]],
+        on="municipality id",
+    )
+    grouped = gcr_age.groupby(
+        ["municipality id", "year", "age group"], observed=True
+    ).agg(
+        {
+            "value": "sum",
+            "lat": "first",
+            "lon": "first",
+            "MUN_NORDIC": "first",
+            "REG_NORDIC": "first",
+            "CNTR": "first",
+        }
+    )
+    total_population = gcr_age.groupby(["municipality id", "year"]).agg(
+        {"value": "sum"}
+    )
+    merged = grouped.merge(
+        total_population,
+        left_on=["municipality id", "year"],
+        right_index=True,
+        suffixes=("_grouped", "_total"),
+    )
+    merged["percentage"] = (merged["value_grouped"] / merged["value_total"]) * 100
+    gcr_age = merged.reset_index()
+    gcr_age.sort_values(["municipality id", "year", "age group"], inplace=True)
+    return gcr_age
+
+
+def measured(f, *args, repeat=5):
+    # best wall time and the peak of the memory allocated during a call
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = f(*args)
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    f(*args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, min(times), peak / 2**20
+
+
+if __name__ == "__main__":
+    municipalities = int(sys.argv[1]) if len(sys.argv) > 1 else 1100
+    years = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    mun, ages = synthetic(municipalities, years)
+
+    expected, t_old, mb_old = measured(age_structure_three_pass, mun, ages)
+    result, t_new, mb_new = measured(age_structure, mun, ages)
+    pd.testing.assert_frame_equal(
+        result, expected[result.columns].reset_index(drop=True)
+    )
+
+    print(f"single-year rows: {len(ages):,}")
+    print(f"three passes:     {t_old:8.3f}s {mb_old:8.1f} MB allocated at peak")
+    print(f"single pass:      {t_new:8.3f}s {mb_new:8.1f} MB allocated at peak")
+    print(f"speedup:          {t_old / t_new:8.1f}x")
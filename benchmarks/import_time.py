@@ -0,0 +1,71 @@
+# Import time of nordgeo and the heavy modules a tabular query pulls in, each
+# measured in a fresh interpreter. Exits with status 1 when a tabular query
+# imports geopandas or plotly. Run from the repository root:
+#   python -m benchmarks.import_time [data dir] [repeat]
+import json
+import os
+import subprocess
+import sys
+
+HEAVY = ["geopandas", "shapely", "plotly", "pyogrio", "fiona"]
+
+CASES = {
+    "import nordgeo.data": "import nordgeo.data",
+    "import plots": "import nordgeo.plots.population_dynamics",
+    "tabular load()": "from nordgeo import data; data.load()",
+    "plot data": (
+        "from nordgeo.plots import population_dynamics; population_dynamics.data()"
+    ),
+}
+
+# the cases that must not import any of HEAVY
+TABULAR = list(CASES)
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+{code}
+seconds = time.perf_counter() - start
+# a package counts as imported once any of its submodules really is, lazy
+# placeholders (nordgeo.lazy) and a bare parent package do not count
+loaded = {{
+    m.split(".")[0]
+    for m, module in list(sys.modules.items())
+    if "." in m and type(module).__name__ != "_LazyModule"
+}}
+heavy = sorted(loaded & set({heavy!r}))
+print(json.dumps({{"seconds": seconds, "heavy": heavy}}))
+"""
+
+
+def measure(code, cwd, repeat):
+    # best of `repeat` fresh interpreters
+    env = {**os.environ, "PYTHONPATH": os.getcwd()}
+    runs = []
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, "-c", PROBE.format(code=code, heavy=HEAVY)],
+            cwd=cwd,
+            env=env,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+        runs.append(json.loads(output.splitlines()[-1]))
+    return min(runs, key=lambda run: run["seconds"])
+
+
+if __name__ == "__main__":
+    cwd = sys.argv[1] if len(sys.argv) > 1 else "."
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    failed = False
+    for name, code in CASES.items():
+        run = measure(code, cwd, repeat)
+        print(f"{name:<20} {run['seconds'] * 1000:8.1f} ms  {', '.join(run['heavy'])}")
+        failed |= name in TABULAR and bool(run["heavy"])
+    baseline = measure("import geopandas, plotly.express", cwd, repeat)
+    print(f"{'(geopandas+plotly)':<20} {baseline['seconds'] * 1000:8.1f} ms")
+    if failed:
+        print("a tabular code path imports geopandas or plotly")
+        sys.exit(1)
@@ -0,0 +1,102 @@
+# update() with and without out_of_core on the same synthetic inputs: checks
+# that both write the same data.parquet, geometry, cube and age store, and
+# compares their time and peak memory. Run from the repository root:
+#   python -m benchmarks.out_of_core [--scale small|region|nordic] [--data DIR]
+# exits with status 1 when the outputs differ.
+import argparse
+import contextlib
+import io
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from benchmarks import synthetic
+from nordgeo import build, profile
+
+MODES = {"pandas": False, "out_of_core": True}
+
+
+def build_mode(root, mode):
+    # update() into root/<mode>, in this process
+    from nordgeo import data
+
+    os.chdir(root)
+    # without the "Building ..." lines
+    with profile.profiling() as report, contextlib.redirect_stdout(io.StringIO()):
+        data.update(
+            target_file=f"{mode}/data.parquet",
+            geometry_file=f"{mode}/municipalities.parquet",
+            cube_dir=f"{mode}/cube",
+            age_dir=f"{mode}/ages",
+            cache_dir=f"{mode}/cache",
+            out_of_core=MODES[mode],
+        )
+    wall = report.records[-1]["wall_s"]
+    print(f"{mode:<12} {wall:8.3f}s {profile._peak_rss():8.1f} MB peak RSS")
+
+
+def differences(root):
+    # output files of the two modes that differ
+    different = []
+    for name in ["data.parquet", "municipalities.parquet"]:
+        a, b = (os.path.join(root, mode, name) for mode in MODES)
+        if build.file_hash(a) != build.file_hash(b):
+            different.append(name)
+            if name == "data.parquet":
+                # the first differing column, for the report
+                try:
+                    pd.testing.assert_frame_equal(
+                        pd.read_parquet(a), pd.read_parquet(b)
+                    )
+                except AssertionError as e:
+                    print(e)
+    for store in ["cube", "ages"]:
+        a, b = (os.path.join(root, mode, store) for mode in MODES)
+        for name in sorted(os.listdir(a)):
+            if name.endswith(".npy") and not np.array_equal(
+                np.load(os.path.join(a, name)),
+                np.load(os.path.join(b, name)),
+                equal_nan=True,
+            ):
+                different.append(f"{store}/{name}")
+    return different
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scale", choices=list(synthetic.SCALES), default="small")
+    parser.add_argument("--data", help="generated inputs to reuse or keep")
+    parser.add_argument("--mode", choices=list(MODES), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    warnings.simplefilter("ignore")
+    if args.mode:
+        # one mode per process, so that the peak RSS is its own
+        build_mode(args.data, args.mode)
+        sys.exit()
+
+    root = args.data or tempfile.mkdtemp(prefix=f"nordgeo-{args.scale}-")
+    if not os.path.exists(os.path.join(root, "data", "mun_2022")):
+        print(f"Generating {args.scale} inputs in {root}")
+        synthetic.generate(root, **synthetic.SCALES[args.scale])
+    for mode in MODES:
+        shutil.rmtree(os.path.join(root, mode), ignore_errors=True)
+        os.makedirs(os.path.join(root, mode))
+        subprocess.run(
+            [sys.executable, "-m", "benchmarks.out_of_core", "--data", root]
+            + ["--mode", mode],
+            check=True,
+        )
+    different = differences(root)
+    if not args.data:
+        shutil.rmtree(root)
+    if different:
+        print(f"Outputs differ: {', '.join(different)}")
+        sys.exit(1)
+    print("Outputs are identical")
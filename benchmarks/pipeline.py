@@ -0,0 +1,151 @@
+# update() stages, load(), the plot data and every figure on synthetic inputs,
+# compared with baselines stored with run --save. Run from the repository root:
+#   python -m benchmarks.pipeline run [--scale small|region|nordic] [--save]
+#   python -m benchmarks.pipeline compare [--scale ...] [--tolerance 1.25]
+# compare exits with status 1 when a benchmark got slower than the tolerance
+# or is missing from the run.
+import argparse
+import importlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import warnings
+
+from benchmarks import synthetic
+from nordgeo import data, geometry, profile, render, rollup
+
+BASELINES = os.path.join(os.path.dirname(__file__), "baselines")
+
+# differences below this many seconds are noise
+NOISE = 0.01
+
+# everything update() writes in the inputs directory, removed before every
+# repeat so that each run is cold
+OUTPUTS = ["data/cache", "cube", "ages", "rollups"]
+
+
+def clear_caches():
+    # the in-process caches of load(), regrouping, rollups and the GeoJSON
+    data._load.cache_clear()
+    data._regroup.cache_clear()
+    rollup._read.cache_clear()
+    rollup._build.cache_clear()
+    geometry._geojson.cache_clear()
+
+
+def run(root, repeat=3):
+    # best of `repeat` cold runs, in seconds per benchmark
+    cwd = os.getcwd()
+    os.chdir(root)
+    timings = {}
+
+    def record(name, seconds):
+        timings[name] = min(timings.get(name, seconds), seconds)
+
+    try:
+        for _ in range(repeat):
+            for output in OUTPUTS:
+                shutil.rmtree(output, ignore_errors=True)
+            clear_caches()
+            with profile.profiling() as report:
+                data.update(cube_dir="cube", age_dir="ages", rollup_dir="rollups")
+            for r in report.records:
+                record(f"update/{'/'.join(r['stack'][1:]) or 'total'}", r["wall_s"])
+
+            clear_caches()
+            start = time.perf_counter()
+            data.load()
+            record("load", time.perf_counter() - start)
+
+            start = time.perf_counter()
+            data.load(age_groups=data.cohorts())
+            record("load/cohorts", time.perf_counter() - start)
+
+            # the plot data from a cold load() cache, including the import
+            clear_caches()
+            start = time.perf_counter()
+            dynamics = importlib.reload(
+                importlib.import_module("nordgeo.plots.population_dynamics")
+            )
+            dynamics.data()
+            record("plot data/population_dynamics", time.perf_counter() - start)
+
+            # every figure render() writes, each from cold caches so that it
+            # includes its load(), rollup and GeoJSON reads
+            for module, name, args in list(render.jobs(data.load())):
+                clear_caches()
+                start = time.perf_counter()
+                f = getattr(importlib.import_module(f"nordgeo.plots.{module}"), name)
+                f(*args, interactive=False)
+                label = "-".join([f"{module}.{name}", *map(str, args)])
+                record(f"plot/{label}", time.perf_counter() - start)
+    finally:
+        os.chdir(cwd)
+    return timings
+
+
+def compare(timings, baseline, tolerance):
+    # benchmarks slower than tolerance x their baseline, and baseline
+    # benchmarks the run did not record at all (nan)
+    slower = {}
+    for name in sorted(timings.keys() | baseline.keys()):
+        seconds = timings.get(name)
+        before = baseline.get(name)
+        if seconds is None:
+            slower[name] = float("nan")
+            print(f"{name:<48} {'':>9} {before:8.3f}s {'':>7}  MISSING")
+            continue
+        ratio = seconds / before if before else float("nan")
+        flag = ""
+        if before is not None and seconds > before * tolerance + NOISE:
+            slower[name] = ratio
+            flag = "  SLOWER"
+        before_s = f"{before:8.3f}s" if before is not None else " " * 9
+        print(f"{name:<48} {seconds:8.3f}s {before_s} {ratio:6.2f}x{flag}")
+    return slower
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("command", choices=["run", "compare"])
+    parser.add_argument("--scale", choices=list(synthetic.SCALES), default="small")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--save", action="store_true", help="store as the baseline")
+    parser.add_argument("--tolerance", type=float, default=1.25)
+    parser.add_argument("--data", help="generated inputs to reuse or keep")
+    args = parser.parse_args()
+
+    path = os.path.join(BASELINES, f"{args.scale}.json")
+    if args.command == "compare" and not os.path.exists(path):
+        sys.exit(
+            f"No {args.scale} baseline in {BASELINES}, record one first with\n"
+            f"  python -m benchmarks.pipeline run --scale {args.scale} --save"
+        )
+
+    warnings.simplefilter("ignore")
+    root = args.data or tempfile.mkdtemp(prefix=f"nordgeo-{args.scale}-")
+    if not os.path.exists(os.path.join(root, "data", "mun_2022")):
+        print(f"Generating {args.scale} inputs in {root}")
+        synthetic.generate(root, **synthetic.SCALES[args.scale])
+    timings = run(root, args.repeat)
+    if not args.data:
+        shutil.rmtree(root)
+
+    if args.command == "run":
+        for name, seconds in sorted(timings.items()):
+            print(f"{name:<48} {seconds:8.3f}s")
+        if args.save:
+            os.makedirs(BASELINES, exist_ok=True)
+            with open(path, "w", encoding="UTF-8") as f:
+                json.dump(timings, f, indent=2, sort_keys=True)
+            print(f"Saved {path}")
+    else:
+        with open(path, encoding="UTF-8") as f:
+            baseline = json.load(f)
+        slower = compare(timings, baseline, args.tolerance)
+        if slower:
+            print(f"{len(slower)} benchmarks slower than {args.tolerance}x or missing")
+            sys.exit(1)
@@ -0,0 +1,83 @@
+# Row-wise region assignment (the fill_region_se/fill_region_dk apply update()
+# used to do) against the id-keyed join of the municipality attributes in
+# data.age_structure(), on a synthetic frame of single-year counts.
+# Run from the repository root: python -m benchmarks.region_lookup [rows]
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+REGIONS = {"Hovedstaden": 29, "Sjælland": 17, "Skåne": 33, "Halland": 6}
+
+ATTRIBUTES = ["municipality id", "lat", "lon", "MUN_NORDIC", "REG_NORDIC", "CNTR"]
+
+
+def synthetic(rows):
+    # the municipality table of update() and rows keyed by municipality id
+    mun = pd.DataFrame(
+        [
+            (
+                f"{region} {i}",
+                region,
+                "DK" if region in ("Hovedstaden", "Sjælland") else "SE",
+            )
+            for region, count in REGIONS.items()
+            for i in range(count)
+        ],
+        columns=["MUN_NORDIC", "REG_NORDIC", "CNTR"],
+    )
+    rng = np.random.default_rng(0)
+    mun["municipality id"] = np.arange(len(mun), dtype="int16")
+    mun["lat"] = rng.uniform(55, 57, len(mun))
+    mun["lon"] = rng.uniform(11, 14, len(mun))
+    ids = rng.integers(0, len(mun), rows).astype("int16")
+    df = pd.DataFrame(
+        {
+            "municipality id": ids,
+            "municipality": mun["MUN_NORDIC"].to_numpy()[ids],
+            "value": rng.integers(0, 500, rows),
+        }
+    )
+    return mun, df
+
+
+def fill_region(mun):
+    # fill_region_se and fill_region_dk of the original update(), per row
+    def fill(row):
+        for region in ["Halland", "Skåne", "Hovedstaden", "Sjælland"]:
+            if (
+                row["municipality"]
+                in mun[mun["REG_NORDIC"] == region]["MUN_NORDIC"].tolist()
+            ):
+                return region
+        return None
+
+    return fill
+
+
+def timed(f):
+    start = time.perf_counter()
+    result = f()
+    return result, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000_000
+    mun, df = synthetic(rows)
+
+    # the row-wise version is far too slow for millions of rows, time a sample
+    sample = df.iloc[:20_000]
+    expected, t_apply = timed(lambda: sample.apply(fill_region(mun), axis=1))
+    t_apply *= rows / len(sample)
+
+    # a left join keeps the row order for the comparison with the sample
+    result, t_join = timed(
+        lambda: df.merge(mun[ATTRIBUTES], on="municipality id", how="left")
+    )
+    assert (result["REG_NORDIC"].iloc[: len(sample)] == expected).all()
+
+    print(f"rows:            {rows:,}")
+    print(f"apply (extrap.): {t_apply:8.2f}s")
+    print(f"id join:         {t_join:8.3f}s")
+    print(f"speedup:         {t_apply / t_join:8.0f}x")
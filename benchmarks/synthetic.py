@@ -0,0 +1,166 @@
+# Synthetic update() inputs in the formats of the real downloads, from the
+# four Greater Copenhagen regions up to all ~1,100 Nordic municipalities.
+# Run from the repository root: python -m benchmarks.synthetic target [scale]
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+os.environ["USE_PYGEOS"] = "0"
+
+import geopandas as gpd
+from shapely.geometry import box
+
+from nordgeo import statbank
+
+# (country, region, municipalities) roughly like the real Nordic split,
+# regions outside Greater Copenhagen are only numbered
+NORDIC = [
+    ("SE", "Skåne", 33),
+    ("SE", "Halland", 6),
+    *[("SE", f"SE-{i}", 12) for i in range(21)],
+    ("DK", "Hovedstaden", 29),
+    ("DK", "Sjælland", 17),
+    *[("DK", f"DK-{i}", 17) for i in range(3)],
+    *[("NO", f"NO-{i}", 32) for i in range(11)],
+    *[("FI", f"FI-{i}", 16) for i in range(19)],
+    *[("IS", f"IS-{i}", 8) for i in range(8)],
+]
+
+GREATER_COPENHAGEN = ["Skåne", "Halland", "Hovedstaden", "Sjælland"]
+
+SCALES = {
+    # a few municipalities per region, for quick runs
+    "small": dict(regions=NORDIC, fraction=0.1, years=5, density=1.0),
+    # the current setup: the four regions plus a neighbour on each side
+    "region": dict(
+        regions=[r for r in NORDIC if r[1] in GREATER_COPENHAGEN or r[1][-2:] == "-0"],
+        fraction=1.0,
+        years=5,
+        density=1.0,
+    ),
+    # all Nordic municipalities over 50 years, FLY66 thinned to 2% of the pairs
+    "nordic": dict(regions=NORDIC, fraction=1.0, years=50, density=0.02),
+}
+
+SE_AGES = [f"{age} years" for age in range(100)] + ["100+ years"]
+DK_AGES = [f"{age} years" for age in range(126)]
+FLY66_AGES = [f"{age} år" for age in range(100)]
+
+
+def municipalities(regions, fraction=1.0):
+    # one row per municipality with a unique official code per country. Names
+    # have no spaces, the DK age table parser strips them.
+    rows = []
+    codes = {"SE": 1000, "DK": 101, "NO": 301, "FI": 5, "IS": 1000}
+    for country, region, count in regions:
+        for i in range(max(1, round(count * fraction))):
+            name = f"{region}-{i}"
+            if (country, region, i) == ("DK", "Hovedstaden", 0):
+                name = "København"
+            rows.append((country, region, name, codes[country]))
+            codes[country] += 1
+    return pd.DataFrame(rows, columns=["country", "region", "municipality", "code"])
+
+
+def shapefile(mun, path):
+    # a grid of squares in the Lambert conformal conic metres of the real layer
+    side = int(np.ceil(np.sqrt(len(mun))))
+    x = 4.0e6 + (np.arange(len(mun)) % side) * 20_000
+    y = 3.0e6 + (np.arange(len(mun)) // side) * 20_000
+    gpd.GeoDataFrame(
+        {
+            "COD_MUN": mun["code"].astype(str),
+            "COD_REG": "R" + mun["region"].str[:3],
+            "NUTS3_2016": "X",
+            "DGURBA": 1,
+            "MUN_NORDIC": mun["municipality"],
+            "REG_NORDIC": mun["region"],
+            "CNTR": mun["country"],
+        },
+        geometry=[box(a, b, a + 15_000, b + 15_000) for a, b in zip(x, y)],
+        crs=3034,
+    ).to_file(path, encoding="utf-8")
+
+
+def by_age(labels, ages, years, rng, high):
+    # region x age rows with one count column per year
+    df = pd.DataFrame(
+        rng.integers(0, high, (len(labels) * len(ages), len(years))), columns=years
+    )
+    df.insert(0, "age", np.tile(ages, len(labels)))
+    df.insert(0, "region", np.repeat(labels, len(ages)))
+    return df
+
+
+def dk_age_table(mun, years, rng, path):
+    # BY2 export: a title line, the municipality only on its first age row
+    with open(path, "w", encoding="ISO-8859-1") as f:
+        f.write("Population 1. January by municipality, age and time\n")
+        f.write(" ; ;" + ";".join(years) + "\n")
+        for name in mun["municipality"]:
+            name = "Copenhagen" if name == "København" else name
+            counts = rng.integers(0, 500, (len(DK_AGES), len(years)))
+            for j, (age, row) in enumerate(zip(DK_AGES, counts)):
+                label = name if j == 0 else " "
+                f.write(f"{label};{age};" + ";".join(map(str, row)) + "\n")
+
+
+def fly66(mun, years, density, rng, target):
+    # FLY66 chunk CSVs, one per destination, streamed into the Parquet dataset
+    labels = (mun["code"].astype(str) + " " + mun["municipality"]).to_numpy()
+    chunks = os.path.join(os.path.dirname(target), "fly66_chunks")
+    os.makedirs(chunks, exist_ok=True)
+    paths = []
+    for i, destination in enumerate(labels):
+        origins = labels[rng.random(len(labels)) < density]
+        n = len(origins) * len(FLY66_AGES) * len(years)
+        chunk = pd.DataFrame(
+            {
+                "TILKOMMUNE": destination,
+                "FRAKOMMUNE": np.repeat(origins, len(FLY66_AGES) * len(years)),
+                "ALDER": np.tile(np.repeat(FLY66_AGES, len(years)), len(origins)),
+                "TID": np.tile(
+                    np.asarray(years, dtype=int), len(origins) * len(FLY66_AGES)
+                ),
+                "INDHOLD": rng.integers(0, 20, n),
+            }
+        )
+        paths.append(os.path.join(chunks, f"fly66_{i}_0.csv"))
+        chunk.to_csv(paths[-1], sep=";", index=False, encoding="UTF-8")
+    statbank.write_fly66_dataset(paths, target)
+
+
+def generate(root, regions=NORDIC, fraction=1.0, years=5, density=1.0, seed=0):
+    # every input update() reads, relative to root like in the repository
+    rng = np.random.default_rng(seed)
+    years = [str(year) for year in range(2023 - years, 2023)]
+    mun = municipalities(regions, fraction)
+    se = mun[mun["country"] == "SE"]
+    dk = mun[mun["country"] == "DK"]
+    se_labels = (se["code"].astype(str) + " " + se["municipality"]).to_numpy()
+
+    os.makedirs(os.path.join(root, "data", "mun_2022"), exist_ok=True)
+    shapefile(mun, os.path.join(root, "data", "mun_2022", "nord_mun22_lcc.shp"))
+    by_age(se_labels, SE_AGES, years, rng, 500).to_csv(
+        os.path.join(root, "data", "SE_data_age.csv"),
+        sep=";",
+        index=False,
+        encoding="ISO-8859-1",
+    )
+    dk_age_table(dk, years, rng, os.path.join(root, "data", "DK_data_age.csv"))
+    fly66(dk, years, density, rng, os.path.join(root, "data", "DK_data_migration"))
+    by_age(se_labels, SE_AGES, years, rng, 50).to_csv(
+        os.path.join(root, "se_in.csv"), sep=";", index=False, encoding="ISO-8859-1"
+    )
+    by_age(se_labels, SE_AGES, years, rng, 50).to_csv(
+        os.path.join(root, "se_out.csv"), sep=" ", index=False, encoding="ISO-8859-1"
+    )
+    return mun
+
+
+if __name__ == "__main__":
+    scale = sys.argv[2] if len(sys.argv) > 2 else "small"
+    mun = generate(sys.argv[1], **SCALES[scale])
+    print(f"{len(mun)} municipalities written to {sys.argv[1]}")
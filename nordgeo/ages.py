@@ -0,0 +1,127 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+# channel -> fact table column, the same names as in data.parquet
+CHANNELS = {"population": "value_grouped", "net migration": "net migration"}
+
+
+class AgeStore:
+    """Single-year age counts per municipality and year.
+
+    `counts` is an int32 array indexed by (channel, municipality, year, age)
+    and `present` a bool array over (channel, municipality, year) telling which
+    cells have data at all, so that any age grouping can be summed from it
+    without going back to the raw tables.
+    """
+
+    def __init__(self, counts, present, ids, years):
+        self.counts = counts
+        self.present = present
+        self.ids = list(ids)
+        self.years = list(years)
+
+    def regroup(self, groups):
+        # groups: {label: first age} like data.AGE_GROUPS or data.cohorts(),
+        # returns a fact table shaped like data.parquet for those groups
+        edges = np.asarray(list(groups.values()), dtype="int64")
+        if len(edges) == 0 or edges[0] < 0 or np.any(np.diff(edges) <= 0):
+            raise ValueError(f"Age groups must start at increasing ages: {groups}")
+
+        # the total is over all ages, also those below the first group
+        total = self.counts[0].sum(axis=-1, dtype="int64", keepdims=True)
+        counts = self.counts[..., edges[0] :]
+        edges = edges - edges[0]
+        # groups starting beyond the oldest age are empty
+        if edges[-1] >= counts.shape[-1]:
+            padding = [(0, 0)] * (counts.ndim - 1) + [(0, edges[-1] + 1)]
+            counts = np.pad(counts, padding)
+        grouped = np.add.reduceat(counts, edges, axis=-1, dtype="int64")
+
+        population, migration = grouped
+        values = {
+            "value_grouped": population,
+            "value_total": np.broadcast_to(total, population.shape),
+            "net migration": migration,
+        }
+
+        # municipality x year x group, only where there is population data
+        m, y = np.nonzero(self.present[0])
+        n = len(groups)
+        df = pd.DataFrame(
+            {
+                "municipality id": np.repeat(np.asarray(self.ids)[m], n),
+                "year": np.repeat(np.asarray(self.years)[y], n).astype(str),
+                "age group": pd.Categorical.from_codes(
+                    np.tile(np.arange(n), len(m)), categories=list(groups)
+                ),
+            }
+        )
+        # int64 like in data.parquet, net migration is nan where it is missing
+        for column, value in values.items():
+            df[column] = value[m, y].reshape(-1)
+        migrated = np.repeat(self.present[1][m, y], n)
+        if not migrated.all():
+            df["net migration"] = df["net migration"].where(migrated)
+        df["municipality id"] = df["municipality id"].astype("int16")
+        return df
+
+    def save(self, path, **meta):
+        # replaced atomically like the cube, readers may have it memory-mapped.
+        # axes.json goes last, its source tells meta() the store is complete
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, "counts.tmp.npy"), self.counts)
+        np.save(os.path.join(path, "present.tmp.npy"), self.present)
+        with open(os.path.join(path, "axes.tmp.json"), "w", encoding="UTF-8") as f:
+            json.dump(
+                {
+                    "channels": list(CHANNELS),
+                    "municipality ids": self.ids,
+                    "years": self.years,
+                    **meta,
+                },
+                f,
+            )
+        for name in ["counts.npy", "present.npy", "axes.json"]:
+            tmp = name.replace(".", ".tmp.")
+            os.replace(os.path.join(path, tmp), os.path.join(path, name))
+
+    @classmethod
+    def open(cls, path, mmap_mode="r"):
+        with open(os.path.join(path, "axes.json"), encoding="UTF-8") as f:
+            axes = json.load(f)
+        counts = np.load(os.path.join(path, "counts.npy"), mmap_mode=mmap_mode)
+        present = np.load(os.path.join(path, "present.npy"))
+        return cls(counts, present, axes["municipality ids"], axes["years"])
+
+
+def meta(path):
+    try:
+        with open(os.path.join(path, "axes.json"), encoding="UTF-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def build(panel):
+    # panel: municipality id, year, age and one column per channel, see
+    # data.single_age_panel
+    if panel.empty:
+        raise ValueError(
+            "Cannot build an age store without ages, is anything in scope?"
+        )
+    ids = sorted(panel["municipality id"].unique().tolist())
+    years = sorted(panel["year"].astype(int).unique().tolist())
+    m = pd.Index(ids).get_indexer(panel["municipality id"])
+    y = pd.Index(years).get_indexer(panel["year"].astype(int))
+    a = panel["age"].to_numpy()
+
+    counts = np.zeros((len(CHANNELS), len(ids), len(years), a.max() + 1), "int32")
+    present = np.zeros((len(CHANNELS), len(ids), len(years)), dtype=bool)
+    for c, column in enumerate(CHANNELS.values()):
+        known = panel[column].notna().to_numpy()
+        counts[c, m[known], y[known], a[known]] = panel[column].to_numpy()[known]
+        present[c, m[known], y[known]] = True
+    return AgeStore(counts, present, ids, years)
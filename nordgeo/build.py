@@ -0,0 +1,127 @@
+import glob
+import hashlib
+import os
+
+import pandas as pd
+import pyarrow.parquet as pq
+
+from nordgeo import lazy, profile
+
+gpd = lazy.module("geopandas")
+
+CACHE_DIR = "data/cache"
+
+_hashes = {}
+
+
+def file_hash(path):
+    # content hash of a file, a directory (all files below it) or a shapefile
+    # (the .shp together with its .dbf/.shx/.prj/... sidecars)
+    if os.path.isdir(path):
+        files = sorted(glob.glob(os.path.join(path, "**", "*"), recursive=True))
+    elif path.endswith(".shp"):
+        files = sorted(glob.glob(path[: -len(".shp")] + ".*"))
+    else:
+        files = [path]
+
+    digest = hashlib.sha256()
+    for name in files:
+        if not os.path.isfile(name):
+            continue
+        stat = os.stat(name)
+        # hashing is skipped for files that did not change during this process
+        key = (name, stat.st_mtime_ns, stat.st_size)
+        if key not in _hashes:
+            h = hashlib.sha256()
+            with open(name, "rb") as f:
+                for block in iter(lambda: f.read(1 << 20), b""):
+                    h.update(block)
+            _hashes[key] = h.hexdigest()
+        digest.update(os.path.relpath(name, path).encode())
+        digest.update(_hashes[key].encode())
+    return digest.hexdigest()
+
+
+def data_version(target_file="data.parquet", geometry_file="municipalities.parquet"):
+    # content hash of the files written by update(), changes with any new data
+    digest = file_hash(target_file) + file_hash(geometry_file)
+    return hashlib.sha256(digest.encode()).hexdigest()[:16]
+
+
+def write_frame(df, path):
+    tmp = f"{path}.tmp"
+    # by dtype name, frames without geometry do not import geopandas
+    if any(getattr(dtype, "name", None) == "geometry" for dtype in df.dtypes):
+        gpd.GeoDataFrame(df).to_parquet(tmp)
+    else:
+        pd.DataFrame(df).to_parquet(tmp)
+    os.replace(tmp, path)
+
+
+def read_frame(path):
+    if b"geo" in (pq.read_schema(path).metadata or {}):
+        return gpd.read_parquet(path)
+    return pd.read_parquet(path)
+
+
+class File(str):
+    """A Stage input naming a file, directory or shapefile.
+
+    The stage key covers its content, see file_hash, while a plain str input
+    like a country code counts by value. Passed to the build as the path.
+    """
+
+
+class Stage:
+    """A cached pipeline step.
+
+    The cache key covers the stage name and version, the content of the input
+    files (File inputs), the keys of the upstream stages and the value of any
+    other input, so it is known before anything is read. A stage is only
+    built when no result for its key is cached yet.
+    """
+
+    def __init__(self, name, version, build, *inputs, cache_dir=CACHE_DIR):
+        self.name = name
+        self.version = version
+        self.build = build
+        self.inputs = inputs
+        self.cache_dir = cache_dir
+        self._result = None
+
+    @property
+    def key(self):
+        digest = hashlib.sha256(f"{self.name}:{self.version}".encode())
+        for i in self.inputs:
+            if isinstance(i, Stage):
+                digest.update(i.key.encode())
+            elif isinstance(i, File):
+                digest.update(file_hash(i).encode())
+            else:
+                # parameters like the region scope, by value
+                digest.update(repr(i).encode())
+        return digest.hexdigest()[:16]
+
+    @property
+    def path(self):
+        return os.path.join(self.cache_dir, f"{self.name}-{self.key}.parquet")
+
+    def ensure(self):
+        # build and persist the result unless it is cached already
+        path = self.path
+        if not os.path.exists(path):
+            inputs = [i.result() if isinstance(i, Stage) else i for i in self.inputs]
+            print("Building", self.name)
+            with profile.stage(self.name) as s:
+                s.rows(in_=inputs)
+                self._result = self.build(*inputs)
+                s.rows(out=self._result)
+                os.makedirs(self.cache_dir, exist_ok=True)
+                write_frame(self._result, path)
+        return path
+
+    def result(self):
+        path = self.ensure()
+        if self._result is None:
+            self._result = read_frame(path)
+        return self._result
@@ -0,0 +1,92 @@
+import numpy as np
+import pandas as pd
+
+# names of the classes over two transitions, by pattern. "/" marks a yearly
+# change larger than the year before, "\" one that is not
+NAMES = {
+    "\\\\": "Overall decline",
+    "\\/": "Negative effect",
+    "/\\": "Positive effect",
+    "//": "Overall growth",
+}
+
+
+def matrix(df, value, key=("municipality id", "municipality")):
+    # long frame with one row per key and year -> keys (a frame of the key
+    # columns), years and a keys x years array of `value`, the years running
+    # from the first to the last one without gaps and missing cells nan
+    key = [key] if isinstance(key, str) else list(key)
+    rows, keys = pd.MultiIndex.from_frame(df[key]).factorize(sort=True)
+    keys = pd.MultiIndex.from_tuples(keys, names=key).to_frame(index=False)
+    years = df["year"].astype(int).to_numpy()
+    span = np.arange(years.min(), years.max() + 1)
+    values = np.full((len(keys), len(span)), np.nan)
+    values[rows, years - span[0]] = df[value].to_numpy(dtype="float64")
+    return keys, span, values
+
+
+def pack(bits):
+    # keys x transitions booleans -> one integer per key, the first
+    # transition in the highest bit
+    n = bits.shape[1]
+    if n > 64:
+        raise ValueError(f"At most 64 transitions fit a code, got {n}")
+    shifts = np.arange(n - 1, -1, -1, dtype=np.uint64)
+    return np.bitwise_or.reduce(
+        bits.astype(np.uint64) << shifts, axis=1, initial=np.uint64(0)
+    )
+
+
+def labels(transitions, codes=None):
+    # code, pattern and class name of the given codes, all of them by default
+    if codes is None:
+        codes = np.arange(2**transitions, dtype=np.uint64)
+    codes = np.asarray(codes, dtype=np.uint64)
+    shifts = np.arange(transitions - 1, -1, -1, dtype=np.uint64)
+    bits = (codes[:, None] >> shifts) & np.uint64(1)
+    patterns = ["".join(row) for row in np.where(bits == 1, "/", "\\")]
+    names = NAMES if transitions == 2 else {}
+    return pd.DataFrame(
+        {
+            "code": codes,
+            "pattern": patterns,
+            "class": [names.get(p, p) for p in patterns],
+        }
+    )
+
+
+def classify(
+    df, value="value_grouped", key=("municipality id", "municipality"), years=None
+):
+    # classes of the keys by how their yearly change of `value` in percent
+    # develops: one bit per transition between consecutive years of the
+    # window, set when the change grew. A window of n years has n - 1
+    # transitions.
+    #
+    # df: one row per key and year, e.g.
+    # rollup.query(["municipality id", "municipality", "year"]). Names are not
+    # unique, so municipalities are keyed by id and the name comes along
+    # years: (first, last) year of the changes to compare, by default all
+    # years with a change
+    keys, span, values = matrix(df, value, key)
+    change = np.diff(values, axis=1) / values[:, :-1] * 100
+    first, last = years or (span[1], span[-1])
+    window = (span[1:] >= int(first)) & (span[1:] <= int(last))
+    if window.sum() < 2:
+        raise ValueError(f"No transitions between {first} and {last}")
+
+    # nan changes do not count as growth
+    codes = pack(np.diff(change[:, window], axis=1) > 0)
+    classified = keys.assign(code=codes)
+    table = labels(window.sum() - 1, np.unique(codes))
+    return classified.merge(table, on="code", how="left")
+
+
+def counts(classified, transitions):
+    # keys per class, with the classes no key falls in as long as there are
+    # few enough of them to list
+    n = classified["code"].value_counts().rename("count")
+    codes = None if transitions <= 16 else np.sort(n.index.to_numpy())
+    table = labels(transitions, codes).join(n, on="code")
+    table["count"] = table["count"].fillna(0).astype(int)
+    return table
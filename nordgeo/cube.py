@@ -0,0 +1,163 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+AXES = ["municipality", "year", "age_group", "metric"]
+
+# bumped whenever the saved layout changes, older cubes are rebuilt
+VERSION = 2
+
+# metric channel -> fact table column
+METRICS = {
+    "population": "value_grouped",
+    "total population": "value_total",
+    "net migration": "net migration",
+}
+
+
+class Cube:
+    """Dense municipality x year x age group x metric panel.
+
+    Selecting single labels or runs of consecutive labels returns NumPy views,
+    so an opened (memory-mapped) cube is sliced without copying. Missing cells
+    are nan.
+    """
+
+    def __init__(self, values, axes, names):
+        self.values = values
+        self.axes = {axis: list(labels) for axis, labels in axes.items()}
+        self.names = list(names)
+        self._positions = {
+            axis: {label: i for i, label in enumerate(labels)}
+            for axis, labels in self.axes.items()
+        }
+        # municipalities can also be selected by name
+        self._positions["municipality"].update(
+            {name: i for i, name in enumerate(self.names)}
+        )
+
+    def _indexer(self, axis, labels):
+        positions = self._positions[axis]
+        # years are strings like the year column, ints are accepted as well
+        if axis == "year":
+            labels = [str(y) for y in labels] if self._is_list(labels) else str(labels)
+        if not self._is_list(labels):
+            return positions[labels]
+        index = [positions[label] for label in labels]
+        # consecutive positions become a slice, which keeps the result a view
+        if index and index == list(range(index[0], index[-1] + 1)):
+            return slice(index[0], index[-1] + 1)
+        return index
+
+    def sel(self, **labels):
+        # e.g. cube.sel(age_group="youth", metric="population") -> array over
+        # (municipality, year); an axis left out is kept whole
+        unknown = set(labels) - set(AXES)
+        if unknown:
+            raise ValueError(f"Unknown axes: {sorted(unknown)}")
+        values = self.values
+        # index the axes back to front so that dropped axes do not shift the rest
+        for axis in reversed(AXES):
+            if axis in labels:
+                index = self._indexer(axis, labels[axis])
+                position = AXES.index(axis)
+                values = values[(slice(None),) * position + (index,)]
+        return values
+
+    def sum(self, over, **labels):
+        # sum over one or more axes of a selection, nan cells count as 0
+        over = [over] if isinstance(over, str) else list(over)
+        kept = [
+            axis for axis in AXES if axis not in labels or self._is_list(labels[axis])
+        ]
+        return np.nansum(
+            self.sel(**labels), axis=tuple(kept.index(axis) for axis in over)
+        )
+
+    @staticmethod
+    def _is_list(labels):
+        return isinstance(labels, (list, tuple, range))
+
+    def to_frame(self, **labels):
+        # long DataFrame with one column per metric, only built when needed
+        selected = {}
+        for axis in AXES:
+            value = labels.get(axis, self.axes[axis])
+            selected[axis] = list(value) if self._is_list(value) else [value]
+        values = self.sel(**selected)
+
+        metrics = selected.pop("metric")
+        index = pd.MultiIndex.from_product(
+            list(selected.values()), names=list(selected)
+        )
+        df = pd.DataFrame(
+            values.reshape(-1, len(metrics)), index=index, columns=metrics
+        )
+        df = df.reset_index().rename(columns={"age_group": "age group"})
+        names = dict(zip(self.axes["municipality"], self.names))
+        df["municipality"] = df["municipality"].map(lambda m: names.get(m, m))
+        return df
+
+    def save(self, path, **meta):
+        # replaced atomically, readers may have the old values memory-mapped.
+        # axes.json goes last, its source tells meta() the cube is complete
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, "values.tmp.npy"), self.values)
+        with open(os.path.join(path, "axes.tmp.json"), "w", encoding="UTF-8") as f:
+            json.dump(
+                {"axes": self.axes, "names": self.names, **meta}, f, ensure_ascii=False
+            )
+        os.replace(
+            os.path.join(path, "values.tmp.npy"), os.path.join(path, "values.npy")
+        )
+        os.replace(os.path.join(path, "axes.tmp.json"), os.path.join(path, "axes.json"))
+
+    @classmethod
+    def open(cls, path, mmap_mode="r"):
+        # memory-mapped, processes opening the same cube share the page cache
+        with open(os.path.join(path, "axes.json"), encoding="UTF-8") as f:
+            meta = json.load(f)
+        values = np.load(os.path.join(path, "values.npy"), mmap_mode=mmap_mode)
+        return cls(values, meta["axes"], meta["names"])
+
+
+def meta(path):
+    try:
+        with open(os.path.join(path, "axes.json"), encoding="UTF-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def build(facts, mun):
+    # facts: the data.parquet fact table, mun: the municipality geometry table
+    if facts.empty or mun.empty:
+        raise ValueError(
+            f"Cannot build a cube from {len(facts)} fact rows and "
+            f"{len(mun)} municipalities, is anything in scope?"
+        )
+    mun = mun.sort_values("municipality id")
+    ids = mun["municipality id"].tolist()
+    years = sorted(facts["year"].astype(str).unique().tolist())
+    age_groups = list(facts["age group"].cat.categories)
+
+    values = np.full((len(ids), len(years), len(age_groups), len(METRICS)), np.nan)
+    m = pd.Index(ids).get_indexer(facts["municipality id"])
+    y = pd.Index(years).get_indexer(facts["year"].astype(str))
+    a = facts["age group"].cat.codes.to_numpy()
+    # -1 would silently write into the last cell of the axis
+    for axis, index in [("municipality id", m), ("year", y), ("age group", a)]:
+        if (index < 0).any():
+            unknown = facts.loc[index < 0, axis].unique().tolist()
+            raise ValueError(f"Fact rows with an unknown {axis}: {unknown}")
+    values[m, y, a] = facts[list(METRICS.values())].to_numpy(dtype="float64")
+
+    axes = {
+        "municipality": ids,
+        "year": years,
+        "age_group": age_groups,
+        "metric": list(METRICS),
+    }
+    return Cube(values, axes, mun["municipality"].tolist())
@@ -1,368 +1,612 @@
+import functools
+import importlib.util
 import os
+import shutil
 
 os.environ["USE_PYGEOS"] = "0"
 
-import geopandas as gpd
 import pandas as pd
 import numpy as np
 import pyarrow
 
-
-def update():
-    # load polygons for The Greater Copenhagen region
-    mun = gpd.read_file("data/mun_2022/nord_mun22_lcc.shp")
-    mun = mun[
-        (mun["REG_NORDIC"] == "Skåne")
-        | (mun["REG_NORDIC"] == "Halland")
-        | (mun["REG_NORDIC"] == "Hovedstaden")
-        | (mun["REG_NORDIC"] == "Sjælland")
-    ]
+from nordgeo import build, cube, lazy, profile, registry, rollup, statbank, stream
+from nordgeo import ages as age_store
+
+# polygons are only needed to build and for map plots
+gpd = lazy.module("geopandas")
+
+# the regions of The Greater Copenhagen area, the default scope of update()
+GREATER_COPENHAGEN = ("Skåne", "Halland", "Hovedstaden", "Sjælland")
+
+# age group -> first age in the group, each group runs up to the next one
+AGE_GROUPS = {"youth": 0, "working age": 20, "elderly": 65}
+
+
+def cohorts(width=5, last=85):
+    # {"0-4": 0, "5-9": 5, ..., "85+": 85}
+    groups = {f"{age}-{age + width - 1}": age for age in range(0, last, width)}
+    groups[f"{last}+"] = last
+    return groups
+
+
+@functools.lru_cache(maxsize=None)
+def parse_age(label):
+    # "0 years", "7 år", "100+ years" and "126+" -> int, anything else -> nan
+    try:
+        return int(str(label).split()[0].rstrip("+"))
+    except (ValueError, IndexError):
+        return np.nan
+
+
+def age_group(ages, groups=AGE_GROUPS):
+    # parse the few distinct age labels once and bin them, then broadcast the
+    # bins back to the rows through the factorized codes
+    codes, labels = pd.factorize(ages)
+    values = np.array([parse_age(label) for label in labels], dtype=float)
+    bins = np.searchsorted(list(groups.values()), values, side="right") - 1
+    bins[np.isnan(values)] = -1
+    bins = np.append(bins, -1)
+    return pd.Categorical.from_codes(bins[codes], categories=list(groups))
+
+
+def _sql_in(column, values):
+    # OGR SQL "column IN (...)" clause
+    quoted = ", ".join("'" + str(value).replace("'", "''") + "'" for value in values)
+    return f'"{column}" IN ({quoted})'
+
+
+def municipalities(shapefile, regions=GREATER_COPENHAGEN, countries=None):
+    # load polygons for the regions and countries in scope, None for all
+    # "IN ()" is not valid OGR SQL, and nothing would be in scope anyway
+    for name, values in [("regions", regions), ("countries", countries)]:
+        if values is not None and len(values) == 0:
+            raise ValueError(f"No {name} selected, use None for all")
+    scope = {"REG_NORDIC": regions, "CNTR": countries}
+    scope = {column: values for column, values in scope.items() if values is not None}
+
+    with profile.stage("read shapefile"):
+        # a misspelt name would silently leave its municipalities out
+        if scope:
+            attributes = gpd.read_file(shapefile, ignore_geometry=True)
+            for name, column in [("regions", "REG_NORDIC"), ("countries", "CNTR")]:
+                unknown = sorted(set(scope.get(column, ())) - set(attributes[column]))
+                if unknown:
+                    raise ValueError(f"Unknown {name} in {shapefile}: {unknown}")
+        if importlib.util.find_spec("pyogrio") is not None:
+            # the scope is pushed down to the reader, the feature ids are the
+            # row numbers of the whole shapefile
+            mun = gpd.read_file(
+                shapefile,
+                engine="pyogrio",
+                where=" AND ".join(_sql_in(c, v) for c, v in scope.items()) or None,
+                fid_as_index=True,
+            )
+        else:
+            mun = gpd.read_file(shapefile)
+            for column, values in scope.items():
+                mun = mun[mun[column].isin(values)]
+    # ids are the row numbers of the whole shapefile, see registry.build
+    mun["municipality id"] = mun.index.astype("int16")
 
     mun["centroid"] = mun["geometry"].centroid
     mun["lat"] = mun["centroid"].y
     mun["lon"] = mun["centroid"].x
 
-    mun = mun.set_crs(3034, allow_override=True)
-    mun = mun.to_crs(4326)
+    with profile.stage("to_crs"):
+        mun = mun.set_crs(3034, allow_override=True)
+        mun = mun.to_crs(4326)
     mun = mun.reset_index(drop=True)
+    return mun
+
+
+def single_ages(labels):
+    # age labels -> int16 single-year ages, -1 where the label is not an age
+    codes, uniques = pd.factorize(labels)
+    values = np.array([parse_age(label) for label in uniques], dtype=float)
+    values = np.append(np.nan_to_num(values, nan=-1), -1).astype("int16")
+    return values[codes]
+
+
+def age_counts(mun, table, se_age, dk_age):
+    reg = registry.Registry(table)
 
     # load SE age structure data by municipality
     # Source: Population by region, marital status, age and sex. Year 1968 - 2022
 
-    SE_data_age = pd.read_csv("data/SE_data_age.csv", sep=";", encoding="ISO-8859-1")
-    SE_data_age = SE_data_age.rename(columns={"region": "municipality"})
-    SE_data_age["municipality"] = SE_data_age["municipality"].str[5:]
+    SE_data_age = pd.read_csv(se_age, sep=";", encoding="ISO-8859-1")
+    SE_data_age["municipality id"] = reg.ids(SE_data_age["region"], "SE")
+    SE_data_age = SE_data_age.drop(["region"], axis=1)
 
     # load DK age structure data by municipality
     # Source: BY2: Population 1. January by municipality, size of the city, age and sex
 
-    DK_data_age = pd.read_csv(
-        "data/DK_data_age.csv", sep=";", encoding="ISO-8859-1", header=1
-    )
+    DK_data_age = pd.read_csv(dk_age, sep=";", encoding="ISO-8859-1", header=1)
     DK_data_age[" "] = DK_data_age[" "].str.replace(" ", "")
     DK_data_age[" "] = DK_data_age[" "].replace("", np.nan)
     DK_data_age = DK_data_age.rename(columns={" ": "municipality", " .1": "age"})
     DK_data_age["municipality"] = DK_data_age["municipality"].fillna(method="ffill")
     DK_data_age = DK_data_age.dropna()
     DK_data_age.reset_index(inplace=True, drop=True)
-    DK_data_age["municipality"] = DK_data_age["municipality"].replace(
-        "Copenhagen", "København"
-    )
-
-    # merge SE age structure data with polygons
-
-    gcr__SE_age = pd.merge(
-        SE_data_age, mun, left_on="municipality", right_on="MUN_NORDIC"
-    )
-
-    def fill_region_se(row):
-        if (
-            row["municipality"]
-            in mun[mun["REG_NORDIC"] == "Halland"]["MUN_NORDIC"].tolist()
-        ):
-            return "Halland"
-        elif (
-            row["municipality"]
-            in mun[mun["REG_NORDIC"] == "Skåne"]["MUN_NORDIC"].tolist()
-        ):
-            return "Skåne"
-        else:
-            return None
-
-    gcr__SE_age["region"] = gcr__SE_age.apply(fill_region_se, axis=1)
-    gcr__SE_age = gcr__SE_age[
-        (gcr__SE_age["REG_NORDIC"] == "Skåne")
-        | (gcr__SE_age["REG_NORDIC"] == "Halland")
-    ]
-
-    # merge DK age structure data with polygons
-
-    gcr__DK_age = pd.merge(
-        DK_data_age, mun, left_on="municipality", right_on="MUN_NORDIC"
-    )
-
-    def fill_region_dk(row):
-        if (
-            row["municipality"]
-            in mun[mun["REG_NORDIC"] == "Hovedstaden"]["MUN_NORDIC"].tolist()
-        ):
-            return "Hovedstaden"
-        elif (
-            row["municipality"]
-            in mun[mun["REG_NORDIC"] == "Sjælland"]["MUN_NORDIC"].tolist()
-        ):
-            return "Sjælland"
-        else:
-            return None
-
-    gcr__DK_age["region"] = gcr__DK_age.apply(fill_region_dk, axis=1)
-    gcr__DK_age = gcr__DK_age[
-        (gcr__DK_age["REG_NORDIC"] == "Hovedstaden")
-        | (gcr__DK_age["REG_NORDIC"] == "Sjælland")
-    ]
-
-    # merge DK and SE age structure data
-
-    gcr_age = pd.concat([gcr__SE_age, gcr__DK_age])
-    gcr_age = gcr_age.drop(["COD_MUN", "COD_REG", "NUTS3_2016", "DGURBA"], axis=1)
-    gcr_age.reset_index(inplace=True, drop=True)
-    gcr_age = gcr_age.melt(
-        id_vars=[
-            "municipality",
-            "age",
-            "region",
-            "geometry",
-            "centroid",
-            "lat",
-            "lon",
-            "MUN_NORDIC",
-            "REG_NORDIC",
-            "CNTR",
-        ],
-        var_name="year",
-    )
-
-    # add age groups to DK and SE age structure data
-
-    age_groups = {"youth": (0, 19), "working age": (20, 64), "elderly": (65, 100)}
-
-    def map_age_group(age):
-        if pd.isnull(age):
-            return None
-        age = str(age).split()[0]
-        try:
-            age = int(age) if age != "126+" else 126
-            for group, (lower, upper) in age_groups.items():
-                if lower <= age <= upper:
-                    return group
-            return "elderly"
-        except ValueError:
-            return None
-
-    gcr_age["age group"] = gcr_age["age"].apply(map_age_group)
-
+    DK_data_age["municipality id"] = reg.ids(DK_data_age["municipality"], "DK")
+    DK_data_age = DK_data_age.drop(["municipality"], axis=1)
+
+    # single-year age counts of the municipalities we have polygons for
+
+    ages = pd.concat([SE_data_age, DK_data_age])
+    ages = ages[ages["municipality id"].isin(mun["municipality id"])]
+    ages = ages.melt(id_vars=["municipality id", "age"], var_name="year")
+    ages["age"] = single_ages(ages["age"])
+    return ages[ages["age"] >= 0].reset_index(drop=True)
+
+
+def age_structure(mun, ages):
+    # population per municipality, year and age group with the total of the
+    # municipality and year and the share of the group in it, one groupby over
+    # the single-year counts and the municipality attributes joined once
+    keys = ["municipality id", "year", "age group"]
+    # grouped by the columns themselves, assigning the age groups would copy
+    # the whole single-year frame
+    groups = pd.Series(age_group(ages["age"]), index=ages.index, name="age group")
     gcr_age = (
-        gcr_age.groupby(["municipality", "year", "age group"])
-        .agg(
-            {
-                "value": "sum",
-                "region": "first",
-                "geometry": "first",
-                "centroid": "first",
-                "lat": "first",
-                "lon": "first",
-                "MUN_NORDIC": "first",
-                "REG_NORDIC": "first",
-                "CNTR": "first",
-            }
-        )
+        ages["value"]
+        .groupby([ages["municipality id"], ages["year"], groups], observed=True)
+        .sum()
+        .rename("value_grouped")
         .reset_index()
     )
-
-    # add the percentage of the total population for each age group
-
-    df = gcr_age
-
-    grouped = df.groupby(["municipality", "year", "age group"]).agg(
-        {
-            "value": "sum",
-            "region": "first",
-            "geometry": "first",
-            "centroid": "first",
-            "lat": "first",
-            "lon": "first",
-            "MUN_NORDIC": "first",
-            "REG_NORDIC": "first",
-            "CNTR": "first",
+    gcr_age["value_total"] = gcr_age.groupby(keys[:2])["value_grouped"].transform("sum")
+    gcr_age["percentage"] = (gcr_age["value_grouped"] / gcr_age["value_total"]) * 100
+
+    # the polygons stay in the geometry table
+    return gcr_age.merge(
+        mun[["municipality id", "lat", "lon", "MUN_NORDIC", "REG_NORDIC", "CNTR"]],
+        on="municipality id",
+    ).sort_values(keys, ignore_index=True)
+
+
+def process_dk(df, reg):
+    df = df.rename(
+        columns={
+            "TILKOMMUNE": "to",
+            "FRAKOMMUNE": "from",
+            "ALDER": "age",
+            "TID": "year",
+            "INDHOLD": "value",
         }
     )
+    # resolve the "101 København" labels once per category instead of every row
+    for column in ["to", "from"]:
+        df[column] = reg.category_ids(df[column], "DK")
+
+    migrated_to = (
+        df.drop(["from"], axis=1)
+        .groupby(by=["to", "year", "age"], observed=True)
+        .sum()
+        .reset_index()
+        .rename(columns={"to": "municipality id", "value": "to"})
+    )
 
-    total_population = gcr_age.groupby(["municipality", "year"]).agg({"value": "sum"})
+    migrated_from = (
+        df.drop(["to"], axis=1)
+        .groupby(by=["from", "year", "age"], observed=True)
+        .sum()
+        .reset_index()
+        .rename(columns={"value": "from", "from": "municipality id"})
+    )
 
-    merged = grouped.merge(
-        total_population,
-        left_on=["municipality", "year"],
-        right_index=True,
-        suffixes=("_grouped", "_total"),
+    return pd.merge(
+        migrated_to,
+        migrated_from,
+        on=["municipality id", "year", "age"],
+        how="outer",
     )
 
-    merged["percentage"] = (merged["value_grouped"] / merged["value_total"]) * 100
 
-    gcr_age = merged.reset_index()
+def process_se(df, reg):
+    df["municipality id"] = reg.ids(df["municipality"], "SE")
+    df = df.drop(["municipality"], axis=1)
+    df["age"] = single_ages(df["age"])
+    return df[df["age"] >= 0].reset_index(drop=True)
 
-    gcr_age.sort_values(["municipality", "year", "age group"], inplace=True)
 
+def dk_migration(table, partition):
     # load DK internal migration data by municipality
     # Source: FLY66: Internal migration between municipalities by sex, age and municipality
 
-    dk_raw = pd.read_csv("data/DK_data_migration.csv")
-
-    def process_dk(df):
-        df = df.rename(
-            columns={
-                "TILKOMMUNE": "to",
-                "FRAKOMMUNE": "from",
-                "ALDER": "age",
-                "TID": "year",
-                "INDHOLD": "value",
-            }
-        )
-        df["to"] = df["to"].str[4:]
-        df["from"] = df["from"].str[4:]
-
-        migrated_to = (
-            df.drop(["from"], axis=1)
-            .groupby(by=["to", "year", "age"])
-            .sum()
-            .reset_index()
-            .rename(columns={"to": "municipality", "value": "to"})
-        )
-
-        migrated_from = (
-            df.drop(["to"], axis=1)
-            .groupby(by=["from", "year", "age"])
-            .sum()
-            .reset_index()
-            .rename(columns={"value": "from", "from": "municipality"})
-        )
-
-        return pd.merge(
-            migrated_to,
-            migrated_from,
-            on=["municipality", "year", "age"],
-            how="outer",
-        )
-
-    df_dk = process_dk(dk_raw)
-
-    # add age groups
-
-    df_dk["age group"] = df_dk["age"].apply(map_age_group)
-
-    df_dk = (
-        df_dk.groupby(["municipality", "year", "age group"])
-        .agg(
-            {
-                "to": "sum",
-                "from": "sum",
-            }
-        )
-        .reset_index()
+    # one year partition of the dataset written by dk_migration_import.py
+    df_dk = process_dk(
+        statbank.read_fly66_partition(partition), registry.Registry(table)
     )
-
-    df_dk["net migration"] = df_dk["to"] - df_dk["from"]
+    df_dk["age"] = single_ages(df_dk["age"])
     df_dk["year"] = df_dk["year"].astype(str)
+    return df_dk[df_dk["age"] >= 0].reset_index(drop=True)
 
+
+def se_migration(table, se_in, se_out):
     # load SE internal migration data by municipality
     # Source: Migration by region, age and sex. Year 1997 - 2022
 
     se_raw = pd.merge(
         left=(
-            pd.read_csv("se_in.csv", sep=";", encoding="ISO-8859-1").melt(
+            pd.read_csv(se_in, sep=";", encoding="ISO-8859-1").melt(
                 id_vars=["region", "age"], var_name="year", value_name="to"
             )
         ),
         right=(
-            pd.read_csv("se_out.csv", sep=" ", encoding="ISO-8859-1").melt(
+            pd.read_csv(se_out, sep=" ", encoding="ISO-8859-1").melt(
                 id_vars=["region", "age"], var_name="year", value_name="from"
             )
         ),
     ).rename(columns={"region": "municipality"})
 
-    def process_se(df):
+    return process_se(se_raw, registry.Registry(table))
 
-        df["municipality"] = df["municipality"].str[5:]
-        df["age group"] = df["age"].apply(map_age_group)
 
-        df = (
-            df.groupby(["municipality", "year", "age group"])
-            .agg(
-                {
-                    "to": "sum",
-                    "from": "sum",
-                }
-            )
-            .reset_index()
+def group_migration(*frames):
+    # single-year migration -> age groups
+    df = pd.concat(frames, ignore_index=True)
+    df["age group"] = age_group(df["age"])
+
+    df = (
+        df.groupby(["municipality id", "year", "age group"], observed=True)
+        .agg(
+            {
+                "to": "sum",
+                "from": "sum",
+            }
         )
+        .reset_index()
+    )
+
+    df["net migration"] = df["to"] - df["from"]
+    df["year"] = df["year"].astype(str)
+    return df
+
+
+def single_age_panel(ages, *migration):
+    # single-year population and net migration for the municipalities and
+    # years of the age structure, the input of the ages.AgeStore
+    moves = pd.concat(migration, ignore_index=True)
+    moves = moves[moves["municipality id"].isin(ages["municipality id"].unique())]
+    moves["net migration"] = moves["to"].fillna(0) - moves["from"].fillna(0)
+    moves["year"] = moves["year"].astype(str)
+    moves = moves.groupby(["municipality id", "year", "age"])["net migration"].sum()
+
+    population = ages.groupby(["municipality id", "year", "age"])["value"].sum()
+    panel = pd.concat(
+        [population.rename("value_grouped"), moves], axis=1, join="outer"
+    ).reset_index()
 
-        df["net migration"] = df["to"] - df["from"]
-        return df
+    # migration of years without population data is dropped
+    def pairs(df):
+        return df["municipality id"].astype("int64") * 10_000 + df["year"].astype(int)
 
-    df_se = process_se(se_raw)
+    panel = panel[pairs(panel).isin(pairs(ages).unique())]
+    return panel.reset_index(drop=True)
 
+
+def merge_migration(df_dk, df_se):
     # merge dk and se migration data
 
     migration = pd.merge(
         df_dk,
         df_se,
-        on=["municipality", "year", "age group", "to", "from", "net migration"],
+        on=["municipality id", "year", "age group", "to", "from", "net migration"],
         how="outer",
     )
     migration["year"] = migration["year"].astype(str)
+    return migration
+
 
-    # add data on internal migration
+def combine(gcr_age, migration):
+    # add data on internal migration, for the municipalities in scope only
     gcr = pd.merge(
-        gcr_age, migration, on=["municipality", "year", "age group"], how="outer"
+        gcr_age, migration, on=["municipality id", "year", "age group"], how="left"
     )
 
-    gcr["region"] = gcr.apply(fill_region_dk, axis=1)
+    # the fact table only references the municipality, geometry and other
+    # attributes live once per municipality in the geometry table
     gcr = gcr[
-        (gcr["REG_NORDIC"] == "Hovedstaden")
-        | (gcr["REG_NORDIC"] == "Sjælland")
-        | (gcr["REG_NORDIC"] == "Skåne")
-        | (gcr["REG_NORDIC"] == "Halland")
+        [
+            "municipality id",
+            "year",
+            "age group",
+            "value_grouped",
+            "value_total",
+            "net migration",
+        ]
     ]
+    gcr["municipality id"] = gcr["municipality id"].astype("int16")
+    return gcr.reset_index(drop=True)
 
-    column_order = [
-        "municipality",
-        "year",
-        "age group",
-        "REG_NORDIC",
-        "CNTR",
-        "geometry",
-        "centroid",
-        "lat",
-        "lon",
-        "value_grouped",
-        "value_total",
-        "net migration",
-    ]
-    gcr = gcr[column_order]
-    gcr.rename(columns={"REG_NORDIC": "region", "CNTR": "country"}, inplace=True)
 
-    return gpd.GeoDataFrame(gcr).to_parquet("data.parquet")
+def geometries(mun):
+    return mun[
+        [
+            "municipality id",
+            "MUN_NORDIC",
+            "REG_NORDIC",
+            "CNTR",
+            "geometry",
+            "centroid",
+            "lat",
+            "lon",
+        ]
+    ].rename(
+        columns={
+            "MUN_NORDIC": "municipality",
+            "REG_NORDIC": "region",
+            "CNTR": "country",
+        }
+    )
 
 
-def load(target_file="data.parquet"):
-    df = gpd.read_parquet(target_file)
+@profile.stage("update")
+def update(
+    target_file="data.parquet",
+    geometry_file="municipalities.parquet",
+    cube_dir="cube",
+    age_dir="ages",
+    rollup_dir="rollups",
+    cache_dir=build.CACHE_DIR,
+    regions=GREATER_COPENHAGEN,
+    countries=None,
+    out_of_core=False,
+):
+    # every stage is cached under its input hashes, a rerun only rebuilds the
+    # stages whose inputs changed (bump a version when changing a stage).
+    #
+    # regions, countries: REG_NORDIC and CNTR values to build the data for,
+    # None for no restriction, e.g. update(regions=None) for all the Nordics
+    #
+    # out_of_core: sum the FLY66 partitions in record batches instead of
+    # reading them whole, see nordgeo.stream. Gives the same files, the FLY66
+    # stages are cached apart from the pandas ones
+    def stage(name, version, f, *inputs):
+        return build.Stage(name, version, f, *inputs, cache_dir=cache_dir)
+
+    shapefile = build.File("data/mun_2022/nord_mun22_lcc.shp")
+    table = stage("registry", 1, registry.build, shapefile)
+    mun = stage(
+        "mun",
+        5,
+        municipalities,
+        shapefile,
+        None if regions is None else tuple(regions),
+        None if countries is None else tuple(countries),
+    )
+    suffix = "_stream" if out_of_core else ""
+    single = stage(
+        "ages",
+        1,
+        age_counts,
+        mun,
+        table,
+        build.File("data/SE_data_age.csv"),
+        build.File("data/DK_data_age.csv"),
+    )
+    gcr_age = stage("gcr_age", 6, age_structure, mun, single)
+
+    # one stage per FLY66 year partition, a new year only builds that year
+    dk_years = [
+        stage(
+            f"dk_ages{suffix}_{year}",
+            2,
+            stream.dk_migration if out_of_core else dk_migration,
+            table,
+            build.File(partition),
+        )
+        for year, partition in statbank.fly66_partitions().items()
+    ]
+    se_ages = stage(
+        "se_ages",
+        1,
+        se_migration,
+        table,
+        build.File("se_in.csv"),
+        build.File("se_out.csv"),
+    )
+    df_dk = stage("df_dk", 3, group_migration, *dk_years)
+    df_se = stage("df_se", 3, group_migration, se_ages)
+    migration = stage("migration", 2, merge_migration, df_dk, df_se)
+    gcr = stage("gcr", 4, combine, gcr_age, migration)
+    geometry = stage("geometry", 1, geometries, mun)
+    panel = stage("panel", 1, single_age_panel, single, se_ages, *dk_years)
+
+    shutil.copyfile(gcr.ensure(), target_file)
+    shutil.copyfile(geometry.ensure(), geometry_file)
+
+    # dense panel for array access, rebuilt when the fact table changed
+    cube_meta = cube.meta(cube_dir)
+    if (cube_meta.get("source"), cube_meta.get("version")) != (gcr.key, cube.VERSION):
+        with profile.stage("cube"):
+            cube.build(gcr.result(), geometry.result()).save(
+                cube_dir, source=gcr.key, version=cube.VERSION
+            )
+
+    # single-year ages for regrouping at load time, see load(age_groups=...)
+    if age_store.meta(age_dir).get("source") != panel.key:
+        with profile.stage("age store"):
+            age_store.build(panel.result()).save(age_dir, source=panel.key)
+
+    # region, country and total sums for the summary charts, see rollup.query
+    version = build.data_version(target_file, geometry_file)
+    if not rollup.current(rollup_dir, version):
+        with profile.stage("rollups"):
+            tables = rollup.build(gcr.result(), geometry.result())
+            rollup.save(tables, rollup_dir, source=version, version=rollup.VERSION)
+
+
+def lagged(df, columns, k=1, keys=("municipality id", "age group")):
+    # values of `columns` k years earlier for the same keys, aligned with df's
+    # index and nan where that year is missing
+    keys = list(keys)
+    years = df["year"].astype(int)
+    order = df[keys].assign(year=years).sort_values([*keys, "year"]).index
+    ordered = df.loc[order, columns].assign(year=years.loc[order])
+    # without keys, e.g. for yearly totals, all rows are one series
+    groups = ordered
+    if keys:
+        groups = ordered.groupby(
+            [df.loc[order, key] for key in keys], observed=True, sort=False
+        )
+    shifted = groups.shift(k)
+    prev = shifted[columns].where(ordered["year"] - shifted["year"] == k)
+    return prev.reindex(df.index)
+
+
+def change(df, column, k=1, percent=False, keys=("municipality id", "age group")):
+    # change of `column` against k years earlier, absolute or in percent
+    prev = lagged(df, [column], k, keys)[column]
+    delta = df[column] - prev
+    return delta / prev * 100 if percent else delta
+
+
+COLUMN_ORDER = [
+    "municipality id",
+    "municipality",
+    "year",
+    "age group",
+    "region",
+    "country",
+    "geometry",
+    "centroid",
+    "lat",
+    "lon",
+    "value_grouped",
+    "value_total",
+    "net migration",
+    "value_grouped_prev",
+    "value_total_prev",
+    "net migration_prev",
+]
+
+FACT_VALUES = ["value_grouped", "value_total", "net migration"]
+
+
+@profile.stage("load")
+def load(
+    target_file="data.parquet",
+    geometry=False,
+    geometry_file="municipalities.parquet",
+    columns=None,
+    filters=None,
+    age_groups=None,
+    age_dir="ages",
+):
+    # results are memoized per file version and query. The returned frame is a
+    # shallow copy sharing its data with the cache, so adding or replacing
+    # columns is fine but values must not be modified in place.
+    #
+    # filters: {"year": ..., "age group": ..., "country": ...} with a value or
+    # a list of values each, pushed down to the Parquet reader
+    #
+    # age_groups: {label: first age} like AGE_GROUPS or cohorts(), regroups the
+    # single-year age store written by update() instead of reading the fact
+    # table, e.g. load(age_groups={"children": 0, "students": 18, "adults": 30})
+    filters = tuple(
+        sorted(
+            (key, tuple(value) if isinstance(value, (list, tuple, set)) else (value,))
+            for key, value in (filters or {}).items()
+        )
+    )
+    df = _load(
+        os.path.abspath(target_file),
+        os.stat(target_file).st_mtime_ns,
+        os.path.abspath(geometry_file),
+        os.stat(geometry_file).st_mtime_ns,
+        geometry,
+        tuple(columns) if columns is not None else None,
+        filters,
+        _regrouping(age_dir, age_groups) if age_groups is not None else None,
+    )
+    return df.copy(deep=False)
 
-    df_py = df.copy()
-    df_py["year"] = (df_py["year"].astype(int) + 1).astype(str)
 
-    merged = df.merge(
-        df_py,
-        how="left",
-        on=["municipality", "year", "age group"],
-        suffixes=["", "_prev"],
+def _regrouping(age_dir, age_groups):
+    # hashable reference to a regrouping of the age store
+    return (
+        os.path.abspath(age_dir),
+        os.stat(os.path.join(age_dir, "counts.npy")).st_mtime_ns,
+        tuple(age_groups.items()),
     )
 
-    column_order = [
-        "municipality",
-        "year",
-        "age group",
-        "region",
-        "country",
-        "geometry",
-        "centroid",
-        "lat",
-        "lon",
-        "value_grouped",
-        "value_total",
-        "net migration",
-        "value_grouped_prev",
-        "value_total_prev",
-        "net migration_prev",
-    ]
 
-    merged = merged[column_order]
+@functools.lru_cache(maxsize=16)
+def _regroup(age_dir, mtime, age_groups):
+    return age_store.AgeStore.open(age_dir).regroup(dict(age_groups))
+
+
+@functools.lru_cache(maxsize=16)
+def _load(
+    target_file,
+    mtime,
+    geometry_file,
+    geometry_mtime,
+    geometry,
+    columns,
+    filters,
+    regrouping,
+):
+    filters = dict(filters)
+    unknown = set(filters) - {"year", "age group", "country"}
+    if unknown:
+        raise ValueError(f"Unsupported filters: {sorted(unknown)}")
+
+    if columns is None:
+        columns = [
+            c for c in COLUMN_ORDER if geometry or c not in ("geometry", "centroid")
+        ]
+
+    # polygons are only read for map plots
+    if geometry:
+        mun = gpd.read_parquet(geometry_file)
+    else:
+        mun = pd.read_parquet(
+            geometry_file,
+            columns=[
+                "municipality id",
+                "municipality",
+                "region",
+                "country",
+                "lat",
+                "lon",
+            ],
+        )
+
+    pushdown = []
+    if "country" in filters:
+        mun = mun[mun["country"].isin(filters["country"])]
+        pushdown.append(("municipality id", "in", mun["municipality id"].tolist()))
+    if "age group" in filters:
+        pushdown.append(("age group", "in", list(filters["age group"])))
+    if "year" in filters:
+        # the previous years are needed for the *_prev columns
+        years = {str(year) for year in filters["year"]}
+        years |= {str(int(year) - 1) for year in years}
+        pushdown.append(("year", "in", sorted(years)))
+
+    values = [c for c in FACT_VALUES if c in columns or f"{c}_prev" in columns]
+    if regrouping is None:
+        df = pd.read_parquet(
+            target_file,
+            columns=["municipality id", "year", "age group", *values],
+            filters=pushdown or None,
+        )
+    else:
+        df = _regroup(*regrouping)
+        for column, op, value in pushdown:
+            df = df[df[column].isin(value)]
+        df = df[["municipality id", "year", "age group", *values]]
+
+    prev = lagged(df, values, keys=["municipality id", "age group"])
+    df = df.join(prev.add_suffix("_prev"))
+    if "year" in filters:
+        df = df[df["year"].isin([str(y) for y in filters["year"]])]
+
+    merged = df.merge(mun, how="left", on="municipality id")
+    merged = merged[list(columns)].reset_index(drop=True)
+
+    if geometry:
+        return gpd.GeoDataFrame(merged, crs=mun.crs)
     return merged
@@ -0,0 +1,121 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from nordgeo import data, registry, statbank
+
+
+class Flows:
+    """Origin-destination migration counts from FLY66.
+
+    `counts` is a dense int32 array indexed by (year, age group, origin,
+    destination) over the municipalities in `ids` (registry ids), so inflow,
+    outflow and net migration are plain axis sums. Moves within a municipality
+    sit on the diagonal, like in the FLY66 totals.
+    """
+
+    def __init__(self, counts, years, age_groups, ids):
+        self.counts = counts
+        self.years = list(years)
+        self.age_groups = list(age_groups)
+        self.ids = np.asarray(ids, dtype="int16")
+
+    def _select(self, year=None, age_group=None):
+        counts = self.counts
+        if year is not None:
+            counts = counts[self.years.index(int(year))][None]
+        if age_group is not None:
+            counts = counts[:, self.age_groups.index(age_group)][:, None]
+        # origin x destination
+        return counts.sum(axis=(0, 1))
+
+    def matrix(self, year=None, age_group=None):
+        # years or age groups left out are summed over
+        return pd.DataFrame(
+            self._select(year, age_group), index=self.ids, columns=self.ids
+        )
+
+    def inflow(self, year=None, age_group=None):
+        return pd.Series(self._select(year, age_group).sum(axis=0), index=self.ids)
+
+    def outflow(self, year=None, age_group=None):
+        return pd.Series(self._select(year, age_group).sum(axis=1), index=self.ids)
+
+    def net(self, year=None, age_group=None):
+        flows = self._select(year, age_group)
+        return pd.Series(flows.sum(axis=0) - flows.sum(axis=1), index=self.ids)
+
+    def top(self, k=10, year=None, age_group=None, internal=False):
+        # the k largest origin -> destination corridors
+        flows = self._select(year, age_group).astype("int64")
+        if not internal:
+            np.fill_diagonal(flows, -1)
+        flat = flows.ravel()
+        k = min(k, flat.size)
+        best = np.argpartition(flat, -k)[-k:]
+        best = best[np.argsort(flat[best])[::-1]]
+        origin, destination = np.unravel_index(best, flows.shape)
+        return pd.DataFrame(
+            {
+                "origin": self.ids[origin],
+                "destination": self.ids[destination],
+                "flow": flat[best],
+            }
+        )
+
+    def save(self, path):
+        # counts as .npy so that open() can memory-map them, axes as JSON
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, "counts.npy"), self.counts)
+        with open(os.path.join(path, "axes.json"), "w", encoding="UTF-8") as f:
+            json.dump(
+                {
+                    "years": self.years,
+                    "age groups": self.age_groups,
+                    "municipality ids": self.ids.tolist(),
+                },
+                f,
+                ensure_ascii=False,
+            )
+
+    @classmethod
+    def open(cls, path, mmap_mode="r"):
+        with open(os.path.join(path, "axes.json"), encoding="UTF-8") as f:
+            axes = json.load(f)
+        counts = np.load(os.path.join(path, "counts.npy"), mmap_mode=mmap_mode)
+        return cls(counts, axes["years"], axes["age groups"], axes["municipality ids"])
+
+
+def build(source, table, groups=data.AGE_GROUPS):
+    # fill the OD array partition by partition straight from the FLY66 dataset
+    reg = registry.Registry(table)
+    partitions = statbank.fly66_partitions(source)
+    years = list(partitions)
+    ids = table.loc[table["country"] == "DK", "municipality id"].to_numpy()
+    position = np.full(len(table), -1, dtype="int64")
+    position[ids] = np.arange(len(ids))
+
+    n = len(ids)
+    shape = (len(years), len(groups), n, n)
+    counts = np.zeros(shape, dtype="int64")
+
+    def positions(labels):
+        # "101 København" labels -> array position, -1 when unknown or missing
+        ids = reg.category_ids(labels, "DK")
+        return np.where(ids >= 0, position[ids], -1)
+
+    for y, partition in enumerate(partitions.values()):
+        df = statbank.read_fly66_partition(partition)
+        destination = positions(df["TILKOMMUNE"])
+        origin = positions(df["FRAKOMMUNE"])
+        age = data.age_group(df["ALDER"], groups).codes
+        valid = (destination >= 0) & (origin >= 0) & (age >= 0)
+        index = np.ravel_multi_index(
+            (age[valid], origin[valid], destination[valid]), shape[1:]
+        )
+        counts[y] = np.bincount(
+            index, weights=df["INDHOLD"].to_numpy()[valid], minlength=counts[y].size
+        ).reshape(shape[1:])
+    return Flows(counts.astype("int32"), years, list(groups), ids)
@@ -0,0 +1,62 @@
+import functools
+import json
+import os
+
+os.environ["USE_PYGEOS"] = "0"
+
+from nordgeo import build, lazy
+
+# only needed when the GeoJSON is not cached yet
+gpd = lazy.module("geopandas")
+shapely = lazy.module("shapely")
+
+# bumped whenever the features written to the cache change
+GEOJSON_VERSION = 2
+
+# simplification tolerance in degrees for the mapbox zoom levels we render at
+ZOOM_TOLERANCE = {5: 0.01, 6: 0.004, 7: 0.002, 8: 0.001, 9: 0.0005}
+
+
+def simplify(geometries, tolerance):
+    # coverage simplification keeps the borders shared by neighbouring
+    # municipalities identical, older shapely/GEOS only preserve the topology
+    # of each polygon on its own
+    if hasattr(shapely, "coverage_simplify"):
+        geometries = shapely.coverage_simplify(geometries, tolerance)
+    else:
+        geometries = shapely.simplify(geometries, tolerance, preserve_topology=True)
+    return shapely.set_precision(geometries, tolerance / 10)
+
+
+def geojson(zoom=6, geometry_file="municipalities.parquet", cache_dir=build.CACHE_DIR):
+    # one simplified feature per municipality, keyed by its id like the
+    # featureidkey="properties.municipality id" used by the plots. Names are
+    # not unique across regions and countries
+    tolerance = ZOOM_TOLERANCE[zoom]
+    key = build.file_hash(geometry_file)[:16]
+    return _geojson(
+        os.path.join(cache_dir, f"geojson-{GEOJSON_VERSION}-{key}-{tolerance}.json"),
+        geometry_file,
+        tolerance,
+    )
+
+
+@functools.lru_cache(maxsize=8)
+def _geojson(path, geometry_file, tolerance):
+    if os.path.exists(path):
+        with open(path, encoding="UTF-8") as f:
+            return json.load(f)
+
+    mun = gpd.read_parquet(
+        geometry_file, columns=["municipality id", "municipality", "geometry"]
+    )
+    mun["geometry"] = simplify(mun["geometry"].values, tolerance)
+    features = json.loads(mun.to_json(drop_id=True))
+    for feature in features["features"]:
+        feature["id"] = feature["properties"]["municipality id"]
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(f"{path}.tmp", "w", encoding="UTF-8") as f:
+        json.dump(features, f, separators=(",", ":"))
+    os.replace(f"{path}.tmp", path)
+    return features
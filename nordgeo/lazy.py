@@ -0,0 +1,18 @@
+import importlib.util
+import sys
+
+
+def module(name):
+    # a module that is only executed on first attribute access, so that the
+    # tabular code paths never pay for geopandas or plotly
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ModuleNotFoundError(f"No module named {name!r}", name=name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    lazy = importlib.util.module_from_spec(spec)
+    sys.modules[name] = lazy
+    loader.exec_module(lazy)
+    return lazy
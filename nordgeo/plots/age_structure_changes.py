@@ -1,12 +1,18 @@
-from nordgeo import data
-import plotly.graph_objects as go
-import geopandas as gpd
-import plotly.express as px
+from nordgeo import data, geometry, lazy, profile, rollup
+import pandas as pd
 
-def show():
-    df = data.load()
+go = lazy.module("plotly.graph_objects")
 
-    df_grouped = df.groupby(["year", "age group"]).sum(numeric_only=True).reset_index()
+# fact table column -> what its change is called in titles
+METRIC_TITLES = {
+    "value_grouped": "Population change",
+    "value_total": "Total population change",
+}
+
+
+@profile.stage()
+def show(interactive=True):
+    df_grouped = rollup.query(["year", "age group"], ["value_grouped"])
     traces = []
 
     age_groups = df_grouped["age group"].unique()[::-1]
@@ -34,103 +40,134 @@ def show():
     )
 
     fig = go.Figure(data=traces, layout=layout)
-    fig.show()
 
+    if interactive:
+        fig.show()
+    return fig
 
-def working():
-    df = data.load()
-    df = df[df["age group"] == "working age"]
-    df = df[df["year"] != "2018"]
 
-    df["population dynamics"] = (
-        (df["value_grouped"] - df["value_grouped_prev"])
-        / df["value_grouped_prev"]
-        * 100
+def dynamics(metric="value_grouped", years=None):
+    # yearly change of `metric` in percent for every municipality and age group
+    df = data.load(
+        columns=["municipality id", "municipality", "year", "age group", metric]
     )
-
-    gdf = gpd.GeoDataFrame(df)
-    gdf = gdf.drop(["centroid"], axis=1)
-
-    px.choropleth_mapbox(
-        title="Population change in 2019-2022 for working age group",
-        data_frame=gdf,
-        geojson=gdf._to_geo(),
-        featureidkey="properties.municipality",
-        locations="municipality",
-        color="population dynamics",
-        range_color=(-5, +5),
-        color_continuous_scale="RdBu",
-        mapbox_style="carto-positron",
-        zoom=6,
-        center={"lat": 56.05, "lon": 12.70},
-        opacity=0.7,
-        labels={"value": "Value"},
-        animation_frame="year",
-        height=800,
-    ).show()
-
-
-def youth():
-    df = data.load()
-    df = df[df["age group"] == "youth"]
-    df = df[df["year"] != "2018"]
-
-    df["population dynamics"] = (
-        (df["value_grouped"] - df["value_grouped_prev"])
-        / df["value_grouped_prev"]
-        * 100
+    df["population dynamics"] = data.change(df, metric, percent=True)
+
+    # the first year has nothing to compare with. years: (first, last), as
+    # ints or strings like the year column
+    first, last = map(str, years or (df["year"].min(), df["year"].max()))
+    return df[(df["year"] > df["year"].min()) & df["year"].between(first, last)]
+
+
+@profile.stage()
+def choropleth(
+    age_groups=None,
+    metric="value_grouped",
+    years=None,
+    color_scale="RdBu",
+    range_color=(-5, +5),
+    interactive=True,
+):
+    # yearly change of `metric` in percent for several age groups in a single
+    # figure: a dropdown picks the age group, the animation runs over the years
+    df = dynamics(metric, years)
+
+    age_groups = age_groups or list(df["age group"].cat.categories)
+    years = sorted(df["year"].unique())
+    # all age groups and years in one table, a row per map
+    z = (
+        df.set_index(["age group", "year", "municipality id"])["population dynamics"]
+        .unstack("municipality id")
+        .reindex(pd.MultiIndex.from_product([age_groups, years]))
     )
+    municipalities = z.columns.tolist()
+    names = df.groupby("municipality id")["municipality"].first()[municipalities]
+    geojson = geometry.geojson(zoom=6)
+
+    def title(age_group):
+        return (
+            f"{METRIC_TITLES.get(metric, metric)} in {years[0]}-{years[-1]}"
+            f" for {age_group} age group"
+        )
 
-    gdf = gpd.GeoDataFrame(df)
-    gdf = gdf.drop(["centroid"], axis=1)
-
-    px.choropleth_mapbox(
-        title="Population change in 2019-2022 for youth age group",
-        data_frame=gdf,
-        geojson=gdf._to_geo(),
-        featureidkey="properties.municipality",
-        locations="municipality",
-        color="population dynamics",
-        range_color=(-5, +5),
-        color_continuous_scale="RdBu",
+    traces = [
+        go.Choroplethmapbox(
+            geojson=geojson,
+            featureidkey="properties.municipality id",
+            locations=municipalities,
+            text=names.tolist(),
+            z=z.loc[(age_group, years[0])],
+            coloraxis="coloraxis",
+            marker_opacity=0.7,
+            name=age_group,
+            visible=i == 0,
+        )
+        for i, age_group in enumerate(age_groups)
+    ]
+    frames = [
+        go.Frame(
+            name=year,
+            data=[go.Choroplethmapbox(z=z.loc[(g, year)]) for g in age_groups],
+            traces=list(range(len(age_groups))),
+        )
+        for year in years
+    ]
+    animate = {"mode": "immediate", "frame": {"duration": 500, "redraw": True}}
+
+    fig = go.Figure(data=traces, frames=frames)
+    fig.update_layout(
+        title=title(age_groups[0]),
         mapbox_style="carto-positron",
-        zoom=6,
-        center={"lat": 56.05, "lon": 12.70},
-        opacity=0.7,
-        labels={"value": "Value"},
-        animation_frame="year",
+        mapbox_zoom=6,
+        mapbox_center={"lat": 56.05, "lon": 12.70},
+        coloraxis=dict(
+            colorscale=color_scale,
+            cmin=range_color[0],
+            cmax=range_color[1],
+            colorbar=dict(title=f"{METRIC_TITLES.get(metric, metric)} (%)"),
+        ),
         height=800,
-    ).show()
-
-
-def elderly():
-    df = data.load()
-    df = df[df["age group"] == "elderly"]
-    df = df[df["year"] != "2018"]
-
-    df["population dynamics"] = (
-        (df["value_grouped"] - df["value_grouped_prev"])
-        / df["value_grouped_prev"]
-        * 100
+        updatemenus=[
+            dict(
+                buttons=[
+                    dict(
+                        label=age_group,
+                        method="update",
+                        args=[
+                            {"visible": [g == age_group for g in age_groups]},
+                            {"title": title(age_group)},
+                        ],
+                    )
+                    for age_group in age_groups
+                ],
+                x=0,
+                y=1.05,
+                xanchor="left",
+            ),
+            dict(
+                type="buttons",
+                buttons=[
+                    dict(label="Play", method="animate", args=[None, animate]),
+                ],
+                x=0.1,
+                y=0,
+                xanchor="right",
+                yanchor="top",
+            ),
+        ],
+        sliders=[
+            dict(
+                x=0.1,
+                len=0.9,
+                currentvalue={"prefix": "year="},
+                steps=[
+                    dict(label=year, method="animate", args=[[year], animate])
+                    for year in years
+                ],
+            )
+        ],
     )
 
-    gdf = gpd.GeoDataFrame(df)
-    gdf = gdf.drop(["centroid"], axis=1)
-
-    px.choropleth_mapbox(
-        title="Population change in 2019-2022 for elderly age group",
-        data_frame=gdf,
-        geojson=gdf._to_geo(),
-        featureidkey="properties.municipality",
-        locations="municipality",
-        color="population dynamics",
-        range_color=(-5, +5),
-        color_continuous_scale="RdBu",
-        mapbox_style="carto-positron",
-        zoom=6,
-        center={"lat": 56.05, "lon": 12.70},
-        opacity=0.7,
-        labels={"value": "Value"},
-        animation_frame="year",
-        height=800,
-    ).show()
+    if interactive:
+        fig.show()
+    return fig
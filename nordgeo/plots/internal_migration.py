@@ -1,20 +1,16 @@
-import plotly.express as px
-from nordgeo import data
-import geopandas as gpd
+from nordgeo import data, geometry, lazy, profile, rollup
 import pandas as pd
 import math
 
+px = lazy.module("plotly.express")
 
-def bar():
-    df = (
-        data.load()
+
+def components():
+    # yearly population change split into internal net migration and the rest
+    return (
+        rollup.query(["year"], ["value_grouped", "net migration"], prev=True)
         .rename(columns={"net migration": "Internal net migration"})
         .loc[lambda x: x.year != "2018"]
-        .groupby(["year"])[
-            ["value_grouped", "value_grouped_prev", "Internal net migration"]
-        ]
-        .sum()
-        .reset_index()
         .assign(population=lambda x: x.value_grouped)
         .assign(
             Other=lambda x: x.value_grouped
@@ -24,7 +20,12 @@ def bar():
         .loc[:, ["year", "Other", "Internal net migration"]]
     )
 
-    px.bar(
+
+@profile.stage()
+def bar(interactive=True):
+    df = components()
+
+    fig = px.bar(
         data_frame=df,
         y=["Other", "Internal net migration"],
         x="year",
@@ -33,13 +34,16 @@ def bar():
         title="Internal net migration in total population change",
         xaxis_title="Population change (absolute)",
         yaxis_title="Year",
-    ).show()
+    )
 
+    if interactive:
+        fig.show()
+    return fig
 
-def migration_trend_map():
-    df = data.load()
-    df = df[df["age group"] == "working age"]
-    df = df[df["year"] == "2022"]
+
+@profile.stage()
+def migration_trend_map(interactive=True):
+    df = data.load(geometry=True, filters={"age group": "working age", "year": "2022"})
     df["net migration trend"] = df["net migration"].apply(
         lambda x: "positive" if x > 0 else "negative"
     )
@@ -49,7 +53,7 @@ def migration_trend_map():
     df["lat"] = df["centroid"].y
     df["lon"] = df["centroid"].x
 
-    px.scatter_mapbox(
+    fig = px.scatter_mapbox(
         df,
         lat="lat",
         lon="lon",
@@ -67,10 +71,15 @@ def migration_trend_map():
         mapbox_style="carto-positron",
         mapbox_zoom=7,
         mapbox_center={"lat": 56.05, "lon": 12.70},
-    ).show()
+    )
 
+    if interactive:
+        fig.show()
+    return fig
 
-def migration_share_map():
+
+@profile.stage()
+def migration_share_map(interactive=True):
     labels = [
         "<-0.5",
         "-0.5 - -0.1",
@@ -82,9 +91,9 @@ def migration_share_map():
     def categorize(x):
         return pd.cut(x, bins=[-math.inf, -0.5, -0.1, 0.1, 1, math.inf], labels=labels)
 
-    df = data.load()
-    df = gpd.GeoDataFrame(
-        df.groupby(["municipality", "year", "geometry"], sort=False)
+    df = (
+        data.load()
+        .groupby(["municipality id", "municipality", "year"], sort=False)
         .sum(numeric_only=True)[["value_grouped", "net migration"]]
         .reset_index()
         .assign(
@@ -93,11 +102,11 @@ def migration_share_map():
         .assign(category=lambda x: categorize(x["migration_percentage"]))
     )
 
-    px.choropleth_mapbox(
+    fig = px.choropleth_mapbox(
         data_frame=df,
-        geojson=df._to_geo(),
-        locations="municipality",
-        featureidkey="properties.municipality",
+        geojson=geometry.geojson(zoom=6),
+        locations="municipality id",
+        featureidkey="properties.municipality id",
         color="category",
         mapbox_style="carto-positron",
         center={"lat": 56.05, "lon": 12.70},
@@ -114,6 +123,8 @@ def migration_share_map():
         category_orders={"category": labels},
         color_discrete_sequence=px.colors.sequential.RdBu[3:],
         title="Internal net migration in total population",
-    ).update_layout(
-        legend=dict(title="Internal net migration in total population (%)")
-    ).show()
+    ).update_layout(legend=dict(title="Internal net migration in total population (%)"))
+
+    if interactive:
+        fig.show()
+    return fig
@@ -1,21 +1,17 @@
-import os
+from nordgeo import data, geometry, lazy, profile
 
-os.environ["USE_PYGEOS"] = "0"
-import geopandas as gpd
-from nordgeo import data
-import plotly.express as px
+px = lazy.module("plotly.express")
 
 # Municipal level population trend
 
 
-def show():
+@profile.stage()
+def show(interactive=True):
     df = data.load()
 
-    df.sort_values(["municipality", "year"], inplace=True)
+    df.sort_values(["municipality id", "year"], inplace=True)
 
-    df["population dynamics"] = (
-        (df["value_total"] - df["value_total_prev"]) / df["value_total_prev"] * 100
-    )
+    df["population dynamics"] = data.change(df, "value_total", percent=True)
 
     # previous_total_value = {}
     # for index, row in df.iterrows():
@@ -34,9 +30,7 @@ def show():
     # df.loc[df['population dynamics'] < 0, 'population trend'] = 'population decrease'
 
     # Working age group trend
-    gdf = gpd.GeoDataFrame(df)
-    gdf = gdf.drop(["centroid"], axis=1)
-    gdf = gdf[gdf["year"] != "2018"]
+    df = df[df["year"] != "2018"]
 
     # color_map = {
     #     'population increase': 'green',
@@ -45,10 +39,11 @@ def show():
 
     fig = px.choropleth_mapbox(
         title="Population change in 2019-2022",
-        data_frame=gdf,
-        geojson=gdf._to_geo(),
-        featureidkey="properties.municipality",
-        locations="municipality",
+        data_frame=df,
+        geojson=geometry.geojson(zoom=6),
+        featureidkey="properties.municipality id",
+        locations="municipality id",
+        hover_name="municipality",
         # color='population trend',
         color="population dynamics",
         range_color=(-5, +5),
@@ -67,4 +62,6 @@ def show():
         coloraxis_colorbar=dict(title="Population change (%)")
     )
 
-    fig.show()
+    if interactive:
+        fig.show()
+    return fig
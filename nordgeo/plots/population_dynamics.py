@@ -1,39 +1,77 @@
-from nordgeo import data
-import plotly.express as px
+from nordgeo import classify, geometry, lazy, profile, rollup
+from nordgeo import data as nordgeo_data
 
-df = data.load()
+px = lazy.module("plotly.express")
+
+
+def __getattr__(name):
+    # the data used to be loaded on import, now only when it is asked for
+    if name == "df":
+        return nordgeo_data.load()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 def data():
     return (
-        df.loc[df["year"] != "2018"]
-        .groupby(["year", "municipality"])
-        .agg({"value_grouped": "sum", "value_grouped_prev": "sum"})
+        nordgeo_data.load()
+        .groupby(["year", "municipality id", "municipality"])
+        .agg({"value_grouped": "sum"})
+        .reset_index()
         .assign(population=lambda x: x.value_grouped)
-        .assign(population_change=lambda x: x.value_grouped - x.value_grouped_prev)
         .assign(
-            population_change_percent=lambda x: (x.value_grouped - x.value_grouped_prev)
-            / x.value_grouped_prev
-            * 100
+            population_change=lambda x: nordgeo_data.change(
+                x, "value_grouped", keys=["municipality id"]
+            )
         )
-        .loc[:, ["population", "population_change", "population_change_percent"]]
-        .reset_index()
+        .assign(
+            population_change_percent=lambda x: nordgeo_data.change(
+                x, "value_grouped", percent=True, keys=["municipality id"]
+            )
+        )
+        .loc[lambda x: x.year != "2018"]
+        .loc[
+            :,
+            [
+                "year",
+                "municipality id",
+                "municipality",
+                "population",
+                "population_change",
+                "population_change_percent",
+            ],
+        ]
+        .reset_index(drop=True)
     )
 
 
-def bar():
-    df = data().groupby(["year"])[["population_change"]].sum().reset_index()
+@profile.stage()
+def bar(interactive=True):
+    df = (
+        rollup.query(["year"], ["value_grouped"], prev=True)
+        .assign(population_change=lambda x: x.value_grouped - x.value_grouped_prev)
+        .loc[lambda x: x.year != "2018", ["year", "population_change"]]
+        .reset_index(drop=True)
+    )
 
-    px.bar(data_frame=df, y="population_change", x="year",).update_layout(
+    fig = px.bar(
+        data_frame=df,
+        y="population_change",
+        x="year",
+    ).update_layout(
         title="Population Change in 2019-2022",
         xaxis_title="Year",
         yaxis_title="Population change (absolute numbers)",
-    ).show()
+    )
 
+    if interactive:
+        fig.show()
+    return fig
 
-def violin():
+
+@profile.stage()
+def violin(interactive=True):
     df = data()
-    px.violin(
+    fig = px.violin(
         df,
         y="population_change_percent",
         x="year",
@@ -47,16 +85,22 @@ def violin():
         xaxis_title="Year",
         yaxis_title="Population Change (%)",
         legend=dict(title="Year"),
-    ).show()
+    )
 
+    if interactive:
+        fig.show()
+    return fig
 
-def lines():
+
+@profile.stage()
+def lines(interactive=True):
     df = data()
-    px.line(
+    fig = px.line(
         df,
         y="population_change_percent",
         x="year",
         color="municipality",
+        line_group="municipality id",
         height=800,
         hover_name="municipality",
         line_shape="spline",
@@ -66,22 +110,29 @@ def lines():
         title="Population change trends",
         xaxis_title="Year",
         yaxis_title="Population change (%)",
-    ).show()
+    )
 
+    if interactive:
+        fig.show()
+    return fig
 
-def scatter(year_from, year_to):
+
+@profile.stage()
+def scatter(year_from, year_to, interactive=True):
     df = (
         data()
         .loc[lambda x: x.year != "2022"]
         .pivot_table(
-            values="population_change_percent", index="municipality", columns="year"
+            values="population_change_percent",
+            index=["municipality id", "municipality"],
+            columns="year",
         )
         .assign(median=lambda x: x.median(axis=1))
         .assign(change=lambda x: x[year_to] - x[year_from])
         .reset_index()
     )
 
-    px.scatter(
+    fig = px.scatter(
         data_frame=df,
         y="median",
         x="change",
@@ -94,61 +145,61 @@ def scatter(year_from, year_to):
         title="Population change groups",
         xaxis_title="Change strength",
         yaxis_title="Median population change (%)",
-    ).show()
-
-
-def classes():
-    # 0 0 0 \\ Overall decline
-    # 0 1 1 \/ Negative effect
-    # 1 0 2 /\ Positive effect
-    # 1 1 3 // Overall growth
-    m_classes = {
-        0: "Overall decline",
-        1: "Negative effect",
-        2: "Positive effect",
-        3: "Overall growth",
-    }
+    )
 
+    if interactive:
+        fig.show()
+    return fig
+
+
+@profile.stage()
+def classes(years=None, interactive=True):
+    # municipalities by whether their yearly population change grew from one
+    # year to the next, see nordgeo.classify. Over two transitions:
+    # \\ Overall decline
+    # \/ Negative effect
+    # /\ Positive effect
+    # // Overall growth
+    #
+    # years: (first, last) year of the changes compared, by default all years
+    # with a change but the latest
+    df = rollup.query(["municipality id", "municipality", "year"], ["value_grouped"])
+    if years is None:
+        changes = sorted(df["year"].unique())[1:]
+        # the window leaves out the latest change and compares at least two
+        if len(changes) < 3:
+            raise ValueError(f"Classes need at least 4 years, got {len(changes) + 1}")
+        years = (changes[0], changes[-2])
+
+    # by municipality name, px colours the classes in order of appearance
     class_df = (
-        data()
-        .loc[lambda x: x.year != "2022"]
-        .pivot_table(
-            values="population_change_percent", index="municipality", columns="year"
-        )
-        .assign(median=lambda x: x.median(axis=1))
-        .assign(change_2020=lambda x: (x["2020"] - x["2019"] > 0).astype(int))
-        .assign(change_2021=lambda x: (x["2021"] - x["2020"] > 0).astype(int))
-        .assign(
-            m_class=lambda x: ((x.change_2020 * 2) + x.change_2021).replace(m_classes)
-        )
+        classify.classify(df, years=years)
+        .rename(columns={"class": "m_class"})
+        .sort_values(["municipality", "municipality id"], ignore_index=True)
         .assign(count=1)
-        .reset_index()
     )
 
-    px.bar(
-        class_df.groupby(["municipality", "m_class"])["count"].sum().reset_index(),
+    counts = class_df.groupby(["municipality id", "municipality", "m_class"])
+    bar_chart = px.bar(
+        counts["count"].sum().reset_index(),
         x="m_class",
         y="count",
         color="municipality",
         color_discrete_sequence=["blue"],
-        title="Classification of the municipalities by population change in 2019-2021",
+        title="Classification of the municipalities by population change in "
+        f"{years[0]}-{years[1]}",
     ).update_layout(
         xaxis_title="Class", yaxis_title="Count", legend=dict(title="Municipality")
-    ).show()
+    )
 
     #  display(class_df.groupby("m_class")["count"].sum().reset_index())
 
-    gdf = (
-        df.drop("centroid", axis=1)
-        .merge(class_df, on="municipality", how="left")
-        .loc[:, ["municipality", "geometry", "m_class"]]
-    )
-
-    px.choropleth_mapbox(
-        data_frame=gdf,
-        geojson=gdf._to_geo(),
-        featureidkey="properties.municipality",
-        locations="municipality",
+    choropleth = px.choropleth_mapbox(
+        data_frame=class_df.loc[:, ["municipality id", "municipality", "m_class"]],
+        geojson=geometry.geojson(zoom=6),
+        featureidkey="properties.municipality id",
+        locations="municipality id",
+        hover_name="municipality",
         color="m_class",
         mapbox_style="carto-positron",
         zoom=6,
@@ -159,5 +210,11 @@ def classes():
         color_discrete_sequence=px.colors.sequential.RdBu[3:],
     ).update_layout(
         legend=dict(title="Population change trend"),
-        title="Classification of the municipalities by population change in 2019-2021",
-    ).show()
+        title="Classification of the municipalities by population change in "
+        f"{years[0]}-{years[1]}",
+    )
+
+    if interactive:
+        bar_chart.show()
+        choropleth.show()
+    return bar_chart, choropleth
@@ -0,0 +1,171 @@
+import argparse
+import contextlib
+import functools
+import importlib
+import json
+import time
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+# the active Report, None while profiling is off
+_report = None
+
+
+def _peak_rss():
+    # peak resident set size of this process in MB, ru_maxrss is in KB on Linux
+    if resource is None:
+        return 0.0
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _rows(value):
+    # row count of a frame or a list of frames, None for anything else
+    if isinstance(value, (list, tuple)):
+        counts = [_rows(v) for v in value]
+        counts = [c for c in counts if c is not None]
+        return sum(counts) if counts else None
+    shape = getattr(value, "shape", None)
+    return shape[0] if shape else None
+
+
+class Report:
+    """Timings of the profiled stages, in the order in which they finished."""
+
+    def __init__(self, log=False):
+        self.records = []
+        self.log = log
+        self._stack = []
+
+    def save(self, path):
+        with open(path, "w", encoding="UTF-8") as f:
+            json.dump(self.records, f, indent=2)
+
+    def save_folded(self, path):
+        # folded stacks with the self wall time in microseconds, the input
+        # format of flamegraph.pl, inferno and speedscope
+        with open(path, "w", encoding="UTF-8") as f:
+            for record in self.records:
+                self_time = int(record["self_s"] * 1e6)
+                f.write(f"{';'.join(record['stack'])} {self_time}\n")
+
+    def summary(self):
+        width = max((len(";".join(r["stack"])) for r in self.records), default=5)
+        lines = [f"{'stage':<{width}} {'wall':>8} {'cpu':>8} {'rss MB':>8} rows"]
+        for r in self.records:
+            rows = f"{r['rows_in'] or '-'} -> {r['rows_out'] or '-'}"
+            lines.append(
+                f"{';'.join(r['stack']):<{width}} {r['wall_s']:8.3f} {r['cpu_s']:8.3f}"
+                f" {r['peak_rss_delta_mb']:8.1f} {rows}"
+            )
+        return "\n".join(lines)
+
+
+class stage:
+    """Profiles a named stage, as a context manager or a function decorator.
+
+    Does nothing but check a global while profiling is off. Inside a
+    profiling() block wall time, CPU time, the growth of the peak RSS and the
+    row counts passed to rows() are recorded, nested stages are recorded with
+    their parents. Not thread-safe, stages are meant for the main thread.
+    """
+
+    def __init__(self, name=None):
+        self.name = name
+        self._frame = None
+
+    def __call__(self, f):
+        # as a decorator the returned frame's rows are recorded
+        name = self.name or f"{f.__module__}.{f.__qualname__}"
+
+        @functools.wraps(f)
+        def wrapper(*args, **kwargs):
+            if _report is None:
+                return f(*args, **kwargs)
+            with stage(name) as s:
+                result = f(*args, **kwargs)
+                s.rows(out=result)
+            return result
+
+        return wrapper
+
+    def __enter__(self):
+        if _report is not None:
+            self._frame = {
+                "stage": self.name,
+                "stack": [*(f["stage"] for f in _report._stack), self.name],
+                "rows_in": None,
+                "rows_out": None,
+                "children_s": 0.0,
+                "start": (time.perf_counter(), time.process_time(), _peak_rss()),
+            }
+            _report._stack.append(self._frame)
+        return self
+
+    def rows(self, in_=None, out=None):
+        # frames (or lists of them) or counts going into and out of the stage
+        if self._frame is not None:
+            if in_ is not None:
+                self._frame["rows_in"] = in_ if isinstance(in_, int) else _rows(in_)
+            if out is not None:
+                self._frame["rows_out"] = out if isinstance(out, int) else _rows(out)
+
+    def __exit__(self, *exc):
+        frame, self._frame = self._frame, None
+        if frame is None or _report is None:
+            return False
+        wall, cpu, rss = frame.pop("start")
+        _report._stack.pop()
+        wall = time.perf_counter() - wall
+        children = frame.pop("children_s")
+        record = {
+            **frame,
+            "wall_s": wall,
+            "self_s": wall - children,
+            "cpu_s": time.process_time() - cpu,
+            "peak_rss_delta_mb": _peak_rss() - rss,
+        }
+        if _report._stack:
+            _report._stack[-1]["children_s"] += wall
+        _report.records.append(record)
+        if _report.log:
+            print(json.dumps(record))
+        return False
+
+
+@contextlib.contextmanager
+def profiling(log=False):
+    # with profile.profiling() as report: data.update()
+    global _report
+    previous, _report = _report, Report(log)
+    try:
+        yield _report
+    finally:
+        _report = previous
+
+
+if __name__ == "__main__":
+    # through the package, running as __main__ would give a second _report
+    from nordgeo import data, profile, render
+
+    parser = argparse.ArgumentParser(description="Profile update(), load(), plots")
+    parser.add_argument("--output", default="profile.json")
+    parser.add_argument("--folded", help="also write folded stacks here")
+    parser.add_argument("--plots", action="store_true", help="also build the plots")
+    parser.add_argument("--log", action="store_true", help="print every stage")
+    args = parser.parse_args()
+
+    with profile.profiling(args.log) as report:
+        data.update()
+        df = data.load()
+        if args.plots:
+            for module, name, arguments in render.jobs(df):
+                plots = importlib.import_module(f"nordgeo.plots.{module}")
+                getattr(plots, name)(*arguments, interactive=False)
+
+    print(report.summary())
+    report.save(args.output)
+    if args.folded:
+        report.save_folded(args.folded)
@@ -0,0 +1,105 @@
+import os
+import re
+import warnings
+
+os.environ["USE_PYGEOS"] = "0"
+
+import numpy as np
+import pandas as pd
+
+from nordgeo import lazy
+
+gpd = lazy.module("geopandas")
+
+# names used by the statistics offices that differ from the shapefile
+ALIASES = {"Copenhagen": "København"}
+
+# "1280 Malmö", "101 København"
+LABEL = re.compile(r"^\s*(\d+)\s+(.+?)\s*$")
+
+
+def municipality_codes(codes):
+    # official codes from COD_MUN, with any country prefix dropped
+    return pd.to_numeric(
+        pd.Series(codes, dtype="string").str.replace(r"\D", "", regex=True),
+        errors="coerce",
+    )
+
+
+def build(shapefile):
+    # one row per municipality of the whole shapefile, the id is the row
+    # number so that it matches the "municipality id" of the polygons
+    mun = gpd.read_file(shapefile, ignore_geometry=True)
+    return pd.DataFrame(
+        {
+            "municipality id": np.arange(len(mun), dtype="int16"),
+            "municipality": mun["MUN_NORDIC"],
+            "code": municipality_codes(mun["COD_MUN"]).astype("Int32"),
+            "region": mun["REG_NORDIC"],
+            "country": mun["CNTR"],
+        }
+    )
+
+
+class Registry:
+    """Maps official municipality codes and names to dense int16 ids."""
+
+    def __init__(self, table):
+        if table["municipality"].isna().any():
+            raise ValueError("Municipalities without a name in the registry table")
+        self.table = table
+        self._by_code = {
+            (country, int(code)): id
+            for id, country, code in table[["municipality id", "country", "code"]]
+            .dropna()
+            .itertuples(index=False)
+        }
+        self._by_name = {
+            (country, name): id
+            for id, country, name in table[
+                ["municipality id", "country", "municipality"]
+            ].itertuples(index=False)
+        }
+
+        # names are not unique across the Nordic countries, those get the code
+        names = table["municipality"].where(
+            ~table["municipality"].duplicated(keep=False),
+            table["municipality"] + " (" + table["code"].astype("string") + ")",
+        )
+        duplicated = names[names.duplicated() | names.isna()].unique()
+        if len(duplicated):
+            duplicated = ", ".join(map(str, duplicated))
+            raise ValueError(f"Municipality names not unique by code: {duplicated}")
+        self.dtype = pd.CategoricalDtype(names)
+
+    def _resolve(self, label, country):
+        label = str(label)
+        match = LABEL.match(label)
+        if match:
+            code, label = int(match.group(1)), match.group(2)
+            if (country, code) in self._by_code:
+                return self._by_code[(country, code)]
+        return self._by_name.get((country, ALIASES.get(label, label)), -1)
+
+    def ids(self, labels, country):
+        # "1280 Malmö" or "Malmö" -> id, resolving each distinct label once.
+        # Unknown labels get -1 and are reported instead of silently dropped.
+        codes, uniques = pd.factorize(np.asarray(labels))
+        resolved = np.array(
+            [self._resolve(label, country) for label in uniques], dtype="int16"
+        )
+        unknown = [str(label) for label in uniques[resolved < 0]]
+        if unknown:
+            warnings.warn(f"Unknown {country} municipalities: {', '.join(unknown)}")
+        return np.append(resolved, np.int16(-1))[codes]
+
+    def category_ids(self, labels, country):
+        # categorical labels -> id per row, resolving each category once.
+        # Missing labels get -1 like unknown ones instead of wrapping around to
+        # the id of the last category
+        codes = labels.cat.codes.to_numpy()
+        ids = self.ids(labels.cat.categories, country)
+        return np.where(codes >= 0, ids[codes], np.int16(-1))
+
+    def names(self, ids):
+        return pd.Categorical.from_codes(ids, dtype=self.dtype)
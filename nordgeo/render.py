@@ -0,0 +1,199 @@
+import argparse
+import concurrent.futures
+import glob
+import hashlib
+import importlib
+import inspect
+import itertools
+import json
+import os
+import pkgutil
+import shutil
+
+import nordgeo.plots
+from nordgeo import build, data, geometry
+
+# bump to re-render everything, e.g. after changing how figures are written
+VERSION = 1
+
+# modules every plot may depend on besides its own: all of nordgeo outside
+# nordgeo.plots, e.g. data, rollup, classify and the stores load() reads
+SHARED_CODE = sorted(glob.glob(os.path.join(os.path.dirname(__file__), "*.py")))
+
+
+def plots():
+    # (module name, function) of every plot, i.e. every function in
+    # nordgeo.plots taking `interactive`
+    for info in sorted(pkgutil.iter_modules(nordgeo.plots.__path__)):
+        module = importlib.import_module(f"nordgeo.plots.{info.name}")
+        for name, f in inspect.getmembers(module, inspect.isfunction):
+            if f.__module__ == module.__name__ and (
+                "interactive" in inspect.signature(f).parameters
+            ):
+                yield info.name, f
+
+
+def variants(df):
+    # argument sets for the plots that take arguments, from the loaded data
+    years = sorted(df["year"].unique())
+    return {
+        # compares the yearly changes, the first year has none and the last
+        # one is left out by the plot
+        "population_dynamics.scatter": list(itertools.combinations(years[1:-1], 2)),
+    }
+
+
+def jobs(df):
+    # (module, function name, args) for every figure to render
+    arguments = variants(df)
+    for module, f in plots():
+        required = [
+            p
+            for p in inspect.signature(f).parameters.values()
+            if p.default is inspect.Parameter.empty
+        ]
+        if not required:
+            yield module, f.__name__, ()
+        elif f"{module}.{f.__name__}" in arguments:
+            for args in arguments[f"{module}.{f.__name__}"]:
+                yield module, f.__name__, tuple(args)
+        else:
+            print(f"Skipping {module}.{f.__name__}, no arguments for it")
+
+
+def code_version(module):
+    # the plot module and the modules it may load its data through
+    digest = hashlib.sha256(str(VERSION).encode())
+    source = importlib.import_module(f"nordgeo.plots.{module}").__file__
+    for path in [source, *SHARED_CODE]:
+        digest.update(build.file_hash(path).encode())
+    return digest.hexdigest()[:16]
+
+
+def snapshot(output_dir, target_file, geometry_file):
+    # copy of the data files for the workers, so that an update() running
+    # meanwhile cannot change the data under a half rendered batch
+    key = build.data_version(target_file, geometry_file)
+    path = os.path.join(output_dir, ".snapshot", key)
+    if not os.path.exists(path):
+        os.makedirs(f"{path}.tmp", exist_ok=True)
+        shutil.copyfile(target_file, os.path.join(f"{path}.tmp", "data.parquet"))
+        shutil.copyfile(
+            geometry_file, os.path.join(f"{path}.tmp", "municipalities.parquet")
+        )
+        os.replace(f"{path}.tmp", path)
+    # the workers share the GeoJSON cache with this process
+    link = os.path.join(path, "data")
+    if not os.path.lexists(link):
+        os.symlink(os.path.abspath("data"), link)
+    return key, os.path.abspath(path)
+
+
+def _start(path):
+    # worker initializer, the plots read data.load() defaults from the cwd
+    os.chdir(path)
+    data.load()
+
+
+def _jobs():
+    # jobs() with their code versions, enumerated in a worker so that the
+    # plots and variants come from the same code and snapshot they render with
+    return [
+        (module, name, args, code_version(module))
+        for module, name, args in jobs(data.load())
+    ]
+
+
+def _render(module, name, args, path, formats):
+    f = getattr(importlib.import_module(f"nordgeo.plots.{module}"), name)
+    figures = f(*args, interactive=False)
+    if not isinstance(figures, tuple):
+        figures = (figures,)
+
+    files = []
+    for i, fig in enumerate(figures):
+        stem = path if i == 0 else f"{path}-{i}"
+        for extension in formats:
+            if extension == "html":
+                fig.write_html(f"{stem}.html", include_plotlyjs="cdn")
+            else:
+                # static images need kaleido
+                fig.write_image(f"{stem}.{extension}")
+            files.append(f"{stem}.{extension}")
+    return files
+
+
+def render(
+    output_dir="figures",
+    formats=("html",),
+    workers=None,
+    force=False,
+    target_file="data.parquet",
+    geometry_file="municipalities.parquet",
+):
+    # every plot and variant to output_dir, figures whose data and code did
+    # not change since the last run are skipped
+    os.makedirs(output_dir, exist_ok=True)
+    output_dir = os.path.abspath(output_dir)
+    key, path = snapshot(output_dir, target_file, geometry_file)
+
+    manifest_file = os.path.join(output_dir, "manifest.json")
+    try:
+        with open(manifest_file, encoding="UTF-8") as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        manifest = {}
+
+    # simplified once instead of in every worker
+    geometry.geojson(zoom=6, geometry_file=os.path.join(path, "municipalities.parquet"))
+
+    with concurrent.futures.ProcessPoolExecutor(
+        workers, initializer=_start, initargs=(path,)
+    ) as pool:
+        todo = {}
+        for module, name, args, code in pool.submit(_jobs).result():
+            stem = "-".join([f"{module}.{name}", *map(str, args)])
+            version = {"data": key, "code": code}
+            done = manifest.get(stem, {})
+            if (
+                not force
+                and {k: done.get(k) for k in version} == version
+                and all(os.path.exists(file) for file in done.get("files", []))
+                and {os.path.splitext(file)[1][1:] for file in done["files"]}
+                >= set(formats)
+            ):
+                continue
+            todo[stem] = (module, name, args, version)
+        print(f"Rendering {len(todo)} figures")
+
+        futures = {
+            pool.submit(
+                _render, module, name, args, os.path.join(output_dir, stem), formats
+            ): stem
+            for stem, (module, name, args, version) in todo.items()
+        }
+        try:
+            for future in concurrent.futures.as_completed(futures):
+                stem = futures[future]
+                manifest[stem] = {**todo[stem][3], "files": future.result()}
+                print(f"Rendered {stem}")
+        finally:
+            with open(f"{manifest_file}.tmp", "w", encoding="UTF-8") as f:
+                json.dump(manifest, f, indent=2)
+            os.replace(f"{manifest_file}.tmp", manifest_file)
+
+    # snapshots of older data are not needed anymore
+    for old in os.listdir(os.path.join(output_dir, ".snapshot")):
+        if old != key:
+            shutil.rmtree(os.path.join(output_dir, ".snapshot", old))
+    return list(todo)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render all plots to files")
+    parser.add_argument("output_dir", nargs="?", default="figures")
+    parser.add_argument("--formats", nargs="+", default=["html"])
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--force", action="store_true")
+    args = parser.parse_args()
+    render(args.output_dir, args.formats, args.workers, args.force)
@@ -0,0 +1,167 @@
+import functools
+import json
+import os
+
+import pandas as pd
+
+from nordgeo import data, profile
+from nordgeo.build import data_version
+
+# bumped whenever the stored tables change, older rollups are rebuilt
+VERSION = 2
+
+# finest to coarsest, each level with the columns identifying its units.
+# Municipality names are not unique, the id tells them apart
+LEVELS = {
+    "municipality": ["country", "region", "municipality id", "municipality"],
+    "region": ["country", "region"],
+    "country": ["country"],
+    "total": [],
+}
+
+# stored and summed over units and age groups. The total population of a unit
+# is not stored, it is the sum of its population over the age groups
+MEASURES = ["value_grouped", "net migration"]
+
+
+def build(facts, mun):
+    # {level: table} with one row per unit, year and age group, every level
+    # summed from the one below so that they add up exactly. Missing values
+    # count as 0 above the municipalities, like in a groupby sum of the panel
+    tables = {
+        "municipality": facts.merge(
+            mun[["municipality id", "municipality", "region", "country"]],
+            on="municipality id",
+        )[[*LEVELS["municipality"], "year", "age group", *MEASURES]]
+    }
+    finer = tables["municipality"]
+    for level, columns in list(LEVELS.items())[1:]:
+        tables[level] = finer = (
+            finer.groupby([*columns, "year", "age group"], observed=True)[MEASURES]
+            .sum()
+            .reset_index()
+        )
+    return tables
+
+
+def save(tables, path, **meta):
+    os.makedirs(path, exist_ok=True)
+    for level, df in tables.items():
+        file = os.path.join(path, f"{level}.parquet")
+        df.to_parquet(f"{file}.tmp")
+        os.replace(f"{file}.tmp", file)
+    with open(os.path.join(path, "meta.json"), "w", encoding="UTF-8") as f:
+        json.dump({"levels": list(tables), **meta}, f, ensure_ascii=False)
+
+
+def meta(path):
+    try:
+        with open(os.path.join(path, "meta.json"), encoding="UTF-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def current(path, source):
+    # whether the rollups in path were built from `source` by this version
+    saved = meta(path)
+    return saved.get("source") == source and saved.get("version") == VERSION
+
+
+def level(columns):
+    # the coarsest level that has all of `columns`
+    for name, keys in reversed(LEVELS.items()):
+        if set(columns) <= {*keys, "year", "age group"}:
+            return name
+    raise ValueError(f"No rollup has the columns {sorted(columns)}")
+
+
+def table(
+    level,
+    rollup_dir="rollups",
+    target_file="data.parquet",
+    geometry_file="municipalities.parquet",
+):
+    # the rollup written by update(), built from the data files instead when
+    # rollup_dir is missing or was written for other data, e.g. in the render
+    # snapshots. Memoized, the frame must not be modified in place.
+    version = data_version(target_file, geometry_file)
+    path = os.path.join(rollup_dir, f"{level}.parquet")
+    if current(rollup_dir, version) and os.path.exists(path):
+        return _read(os.path.abspath(path), os.stat(path).st_mtime_ns)
+    return _build(
+        os.path.abspath(target_file), os.path.abspath(geometry_file), version
+    )[level]
+
+
+@functools.lru_cache(maxsize=8)
+def _read(path, mtime):
+    return pd.read_parquet(path)
+
+
+@functools.lru_cache(maxsize=2)
+def _build(target_file, geometry_file, version):
+    mun = pd.read_parquet(
+        geometry_file, columns=["municipality id", "municipality", "region", "country"]
+    )
+    return build(pd.read_parquet(target_file), mun)
+
+
+@profile.stage("rollup query")
+def query(
+    by,
+    measures=("value_grouped", "value_total", "net migration"),
+    filters=None,
+    prev=False,
+    rollup_dir="rollups",
+    target_file="data.parquet",
+    geometry_file="municipalities.parquet",
+):
+    # sums of `measures` by the columns in `by` (municipality, region, country,
+    # year, age group) from the coarsest rollup that can answer the query, e.g.
+    # query(["year", "age group"], ["value_grouped"]) reads a few dozen rows.
+    #
+    # value_total is the whole population of the units like in the fact
+    # table, also when grouping or filtering by age group.
+    # filters: {column: value or list of values}
+    # prev: add the *_prev columns of the year before, "year" must be in `by`
+    by, measures = list(by), list(measures)
+    unknown = set(measures) - {*MEASURES, "value_total"}
+    if unknown:
+        raise ValueError(f"Unknown measures: {sorted(unknown)}")
+    if prev and "year" not in by:
+        raise ValueError(f'prev=True needs "year" in by, got {by}')
+    filters = {
+        column: list(value) if isinstance(value, (list, tuple, set)) else [value]
+        for column, value in (filters or {}).items()
+    }
+    if "year" in filters:
+        filters["year"] = [str(year) for year in filters["year"]]
+    df = table(level([*by, *filters]), rollup_dir, target_file, geometry_file)
+
+    for column, values in filters.items():
+        if column != "age group":
+            df = df[df[column].isin(values)]
+    result = df
+    if "age group" in filters:
+        result = result[result["age group"].isin(filters["age group"])]
+    sums = [m for m in MEASURES if m in measures]
+    if by:
+        result = result.groupby(by, observed=True)[sums].sum().reset_index()
+    else:
+        result = result[sums].sum().to_frame().T
+
+    if "value_total" in measures:
+        # over all age groups, before the age group filter
+        keys = [c for c in by if c != "age group"]
+        if keys:
+            totals = df.groupby(keys)["value_grouped"].sum().rename("value_total")
+            result = result.join(totals, on=keys)
+        else:
+            result["value_total"] = df["value_grouped"].sum()
+    result = result[[*by, *measures]]
+
+    if prev:
+        lagged = data.lagged(result, measures, keys=[c for c in by if c != "year"])
+        result = result.join(lagged.add_suffix("_prev"))
+    return result
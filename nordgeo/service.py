@@ -0,0 +1,182 @@
+import argparse
+import asyncio
+import collections
+import hashlib
+import json
+import traceback
+from urllib.parse import parse_qsl, urlsplit
+
+import pandas as pd
+
+from nordgeo import build, data, geometry
+from nordgeo.plots import age_structure_changes, internal_migration
+from nordgeo.plots import population_dynamics
+
+
+def metrics(metric="value_grouped", year=None, age_group=None):
+    # choropleth-ready values and their yearly change in percent
+    if metric not in data.FACT_VALUES:
+        raise ValueError(f"Unknown metric: {metric}")
+    df = age_structure_changes.dynamics(metric)
+    if year is not None:
+        df = df[df["year"] == year]
+    if age_group is not None:
+        df = df[df["age group"] == age_group]
+    return df
+
+
+# path -> function of the query parameters, returning a frame or JSON data
+ENDPOINTS = {
+    "/population-dynamics": population_dynamics.data,
+    "/migration-components": internal_migration.components,
+    "/metrics": metrics,
+    "/geojson": lambda zoom="6": geometry.geojson(int(zoom)),
+}
+
+
+def body(path, query):
+    result = ENDPOINTS[path](**dict(query))
+    if isinstance(result, pd.DataFrame):
+        return result.to_json(orient="records").encode()
+    return json.dumps(result, separators=(",", ":")).encode()
+
+
+JSON = {"Content-Type": "application/json"}
+
+
+class Cache:
+    """LRU cache of response bodies, keyed on data version, path and query."""
+
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self._bodies = collections.OrderedDict()
+
+    def get(self, key):
+        if key in self._bodies:
+            self._bodies.move_to_end(key)
+            return self._bodies[key]
+        return None
+
+    def put(self, key, value):
+        self._bodies[key] = value
+        self._bodies.move_to_end(key)
+        while len(self._bodies) > self.maxsize:
+            self._bodies.popitem(last=False)
+
+
+class Service:
+    """JSON endpoints over the panel for the dashboard, see ENDPOINTS.
+
+    Responses carry an ETag derived from the data version and the request,
+    so clients revalidate with If-None-Match and get a 304 without a body.
+    Bodies are cached, only misses are computed, in a worker thread.
+    """
+
+    def __init__(self, cache_size=256):
+        self.cache = Cache(cache_size)
+        self._pending = {}
+
+    async def respond(self, method, target, headers):
+        # -> status, headers, body
+        if method not in ("GET", "HEAD"):
+            return 405, {}, b""
+        url = urlsplit(target)
+        if url.path not in ENDPOINTS:
+            return 404, {}, b""
+        query = tuple(sorted(parse_qsl(url.query)))
+
+        # file hashes are memoized, the version changes whenever update() ran
+        key = (build.data_version(), url.path, query)
+        request = hashlib.sha256(repr(key[1:]).encode()).hexdigest()[:8]
+        etag = f'"{key[0]}-{request}"'
+        if headers.get("if-none-match") == etag:
+            return 304, {"ETag": etag}, b""
+
+        content = self.cache.get(key)
+        if content is None:
+            # concurrent misses for the same key share one computation
+            if key not in self._pending:
+                self._pending[key] = asyncio.ensure_future(
+                    asyncio.to_thread(body, url.path, query)
+                )
+            try:
+                content = await self._pending[key]
+            except (TypeError, ValueError, KeyError) as e:
+                return 400, JSON, json.dumps({"error": str(e)}).encode()
+            except Exception as e:
+                # e.g. the data files missing, the connection is still answered
+                traceback.print_exc()
+                return 500, JSON, json.dumps({"error": repr(e)}).encode()
+            finally:
+                self._pending.pop(key, None)
+            self.cache.put(key, content)
+        return 200, {"ETag": etag, **JSON}, content
+
+    async def handle(self, reader, writer):
+        # HTTP/1.1 with keep-alive, one request at a time per connection
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                method, target, protocol = line.decode("latin-1").split()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                status, extra, content = await self.respond(method, target, headers)
+                close = (
+                    protocol == "HTTP/1.0"
+                    or headers.get("connection", "").lower() == "close"
+                )
+                head = [
+                    f"HTTP/1.1 {status} {STATUS[status]}",
+                    f"Content-Length: {len(content)}",
+                    "Cache-Control: no-cache",
+                    f"Connection: {'close' if close else 'keep-alive'}",
+                    *(f"{name}: {value}" for name, value in extra.items()),
+                ]
+                writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1"))
+                if method != "HEAD":
+                    writer.write(content)
+                await writer.drain()
+                if close:
+                    break
+        except (ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host="127.0.0.1", port=8050):
+        # the panel is loaded once up front, later requests hit the cache
+        await asyncio.to_thread(data.load)
+        return await asyncio.start_server(self.handle, host, port)
+
+
+STATUS = {
+    200: "OK",
+    304: "Not Modified",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    500: "Internal Server Error",
+}
+
+
+async def main(host, port):
+    server = await Service().serve(host, port)
+    print(f"Serving {', '.join(ENDPOINTS)} on http://{host}:{port}")
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the panel as JSON")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8050)
+    args = parser.parse_args()
+    asyncio.run(main(args.host, args.port))
@@ -0,0 +1,233 @@
+import hashlib
+import http.client
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlsplit
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+STATBANK_URL = "https://api.statbank.dk/v1/data"
+
+# DK municipality codes used by FLY66
+# fmt: off
+REGIONS = [
+    101, 147, 155, 185, 165, 151, 153, 157, 159, 161, 163, 167, 169, 183, 173, 175,
+    187, 201, 240, 210, 250, 190, 270, 260, 217, 219, 223, 230, 400, 411, 253, 259,
+    350, 265, 269, 320, 376, 316, 326, 360, 370, 306, 329, 330, 340, 336, 390, 420,
+    430, 440, 482, 410, 480, 450, 461, 479, 492, 530, 561, 563, 607, 510, 621, 540,
+    550, 573, 575, 630, 580, 710, 766, 615, 707, 727, 730, 741, 740, 746, 706, 751,
+    657, 661, 756, 665, 760, 779, 671, 791, 810, 813, 860, 849, 825, 846, 773, 840,
+    787, 820, 851,
+]
+# fmt: on
+
+YEARS = [2018, 2019, 2020, 2021, 2022]
+
+# status codes worth retrying, everything else is raised immediately
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+class StatBankError(Exception):
+    pass
+
+
+class StatBankClient:
+    """Thread-safe StatBank client keeping one keep-alive connection per thread."""
+
+    def __init__(self, base_url=STATBANK_URL, retries=5, backoff=0.5, timeout=60):
+        url = urlsplit(base_url)
+        self.scheme = url.scheme
+        self.netloc = url.netloc
+        self.path = url.path.rstrip("/")
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            if self.scheme == "https":
+                conn = http.client.HTTPSConnection(self.netloc, timeout=self.timeout)
+            else:
+                conn = http.client.HTTPConnection(self.netloc, timeout=self.timeout)
+            self._local.conn = conn
+        return conn
+
+    def _reset(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+        self._local.conn = None
+
+    def get(self, table, query):
+        target = f"{self.path}/{table}/CSV?{query}"
+        for attempt in range(self.retries + 1):
+            try:
+                conn = self._connection()
+                conn.request("GET", target, headers={"Connection": "keep-alive"})
+                response = conn.getresponse()
+                # the body has to be drained before the connection can be reused
+                body = response.read()
+                if response.status == 200:
+                    return body.decode("UTF-8")
+                if response.status not in RETRY_STATUS:
+                    raise StatBankError(f"{table}: HTTP {response.status} for {target}")
+                error = StatBankError(f"{table}: HTTP {response.status}")
+            except (http.client.HTTPException, OSError) as e:
+                self._reset()
+                error = e
+            if attempt < self.retries:
+                time.sleep(self.backoff * 2**attempt)
+        raise StatBankError(
+            f"{table}: giving up after {self.retries + 1} attempts"
+        ) from error
+
+
+def split_regions(regions=REGIONS, parts=8):
+    return [[str(i) for i in part.tolist()] for part in np.array_split(regions, parts)]
+
+
+def fly66_query(regions_from, regions_to, years=YEARS):
+    return (
+        f"TILKOMMUNE={','.join(regions_from)}"
+        f"&FRAKOMMUNE={','.join(regions_to)}"
+        "&ALDER=*"
+        f"&Tid={','.join(map(str, years))}"
+    )
+
+
+def _write_atomic(path, text):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="UTF-8") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+def fetch_fly66(
+    checkpoint_dir="data/fly66_chunks",
+    regions=REGIONS,
+    years=YEARS,
+    parts=8,
+    workers=8,
+    client=None,
+):
+    # FLY66 in region chunks, every chunk checkpointed as a CSV file -> the
+    # chunk paths in order. Chunks already in checkpoint_dir are not fetched
+    # again, so a failed run can simply be restarted. The file names carry a
+    # hash of the chunk's query, checkpoints of other years or regions are
+    # never reused
+    client = client or StatBankClient()
+    os.makedirs(checkpoint_dir, exist_ok=True)
+
+    chunks = {}
+    for i, regions_from in enumerate(split_regions(regions, parts)):
+        for j, regions_to in enumerate(split_regions(regions, parts)):
+            query = fly66_query(regions_from, regions_to, years)
+            digest = hashlib.sha256(query.encode()).hexdigest()[:12]
+            path = os.path.join(checkpoint_dir, f"fly66_{i}_{j}_{digest}.csv")
+            chunks[path] = query
+
+    missing = {path: q for path, q in chunks.items() if not os.path.exists(path)}
+    print(f"Fetching {len(missing)} of {len(chunks)} FLY66 chunks")
+
+    def fetch(path, query):
+        _write_atomic(path, client.get("FLY66", query))
+        return path
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(fetch, path, query): path for path, query in missing.items()
+        }
+        failed = []
+        for future in as_completed(futures):
+            try:
+                print("Fetched", future.result())
+            except StatBankError as e:
+                failed.append(futures[future])
+                print("Failed", futures[future], e)
+
+    if failed:
+        raise StatBankError(
+            f"{len(failed)} chunks failed, rerun to fetch the remaining chunks"
+        )
+    return list(chunks)
+
+
+def read_chunk(path):
+    return pd.read_csv(path, sep=";", encoding="UTF-8")
+
+
+# compact dtypes for FLY66 chunks, labels like "101 København" stay categorical
+FLY66_DTYPES = {
+    "TILKOMMUNE": "category",
+    "FRAKOMMUNE": "category",
+    "ALDER": "category",
+    "TID": "int16",
+    "INDHOLD": "int32",
+}
+
+FLY66_SCHEMA = pa.schema(
+    [
+        ("TILKOMMUNE", pa.dictionary(pa.int32(), pa.string())),
+        ("FRAKOMMUNE", pa.dictionary(pa.int32(), pa.string())),
+        ("ALDER", pa.dictionary(pa.int32(), pa.string())),
+        ("INDHOLD", pa.int32()),
+    ]
+)
+
+FLY66_PARTITIONING = ds.partitioning(pa.schema([("TID", pa.int16())]), flavor="hive")
+
+
+def write_fly66_dataset(paths, target="data/DK_data_migration"):
+    # FLY66 chunk CSVs -> Parquet dataset partitioned by year. Every chunk is
+    # appended as one row group per year, so only a single chunk is held in
+    # memory at a time
+    writers = {}
+    try:
+        for path in paths:
+            chunk = pd.read_csv(path, sep=";", encoding="UTF-8", dtype=FLY66_DTYPES)
+            for year, part in chunk.groupby("TID", sort=False):
+                if year not in writers:
+                    partition = os.path.join(target, f"TID={year}")
+                    os.makedirs(partition, exist_ok=True)
+                    writers[year] = pq.ParquetWriter(
+                        os.path.join(partition, "part-0.parquet"), FLY66_SCHEMA
+                    )
+                table = pa.Table.from_pandas(
+                    part.drop(columns="TID"), schema=FLY66_SCHEMA, preserve_index=False
+                )
+                writers[year].write_table(table)
+    finally:
+        for writer in writers.values():
+            writer.close()
+    return target
+
+
+def read_fly66_dataset(source="data/DK_data_migration", years=None):
+    filter = ds.field("TID").isin(years) if years is not None else None
+    return (
+        ds.dataset(source, format="parquet", partitioning=FLY66_PARTITIONING)
+        .to_table(filter=filter)
+        .to_pandas()
+    )
+
+
+def fly66_partitions(source="data/DK_data_migration"):
+    # {year: partition directory} of the dataset written by write_fly66_dataset
+    return {
+        int(name[len("TID=") :]): os.path.join(source, name)
+        for name in sorted(os.listdir(source))
+        if name.startswith("TID=")
+    }
+
+
+def read_fly66_partition(partition):
+    source, name = os.path.split(os.path.normpath(partition))
+    return read_fly66_dataset(source, years=[int(name[len("TID=") :])])
@@ -0,0 +1,121 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow.dataset as ds
+
+from nordgeo import data, registry
+
+# rows per FLY66 record batch. Only FLY66 is streamed: it has a row per
+# origin, destination, age and year and grows with the square of the
+# municipalities. Every other stage holds at most a row per municipality, age
+# and year, the size of the age store update() writes whole anyway
+BATCH_SIZE = 1 << 18
+
+
+class _Labels:
+    """Dense codes for labels across batches, in first-seen order."""
+
+    def __init__(self, resolve=None):
+        self.codes = {}
+        self.values = []
+        self.resolve = resolve
+
+    def encode(self, labels, indices):
+        # distinct labels and an index into them per row -> code per row, only
+        # the few distinct labels of a batch are looked up here
+        new = [label for label in labels if label not in self.codes]
+        if new:
+            values = self.resolve(new) if self.resolve else new
+            for label, value in zip(new, values):
+                self.codes[label] = len(self.values)
+                self.values.append(value)
+        lookup = np.array([self.codes[label] for label in labels], dtype="int64")
+        return lookup[indices]
+
+    def encode_arrow(self, column):
+        # from a dictionary array, the dictionaries of the batches differ.
+        # Nulls are encoded as the label None instead of as a float index
+        labels = column.dictionary.to_pylist()
+        if column.null_count:
+            indices = column.indices.fill_null(len(labels)).to_numpy()
+            return self.encode([*labels, None], indices)
+        return self.encode(labels, column.indices.to_numpy(zero_copy_only=False))
+
+
+def dk_migration(table, partition, batch_size=BATCH_SIZE):
+    # data.dk_migration over record batches of one FLY66 year partition: moves
+    # are summed into dense municipality x age label arrays as they stream by,
+    # instead of grouping the whole partition in pandas
+    reg = registry.Registry(table)
+    municipalities = _Labels(lambda labels: reg.ids(labels, "DK"))
+    ages = _Labels()
+
+    # running sums and row counts per (municipality label, age label),
+    # grown when new labels come in. The label codes of the small row groups
+    # are buffered up to batch_size rows and summed together
+    sums = {"to": np.zeros((0, 0)), "from": np.zeros((0, 0))}
+    seen = {"to": np.zeros((0, 0)), "from": np.zeros((0, 0))}
+    buffer = []
+
+    def flush():
+        size = (len(municipalities.values), len(ages.values))
+        to, from_, age, value = map(np.concatenate, zip(*buffer))
+        for mun, name in [(to, "to"), (from_, "from")]:
+            key = mun * size[1] + age
+            for totals, weights in [(sums, value), (seen, None)]:
+                counts = np.bincount(key, weights, minlength=size[0] * size[1])
+                totals[name] = _grow(totals[name], size) + counts.reshape(size)
+        buffer.clear()
+
+    rows = 0
+    dataset = ds.dataset(partition, format="parquet")
+    for batch in dataset.to_batches(batch_size=batch_size):
+        # rows without an age are left out like by the groupby in process_dk,
+        # those without a municipality get id -1 like unknown ones
+        if batch.column("ALDER").null_count:
+            batch = batch.filter(batch.column("ALDER").is_valid())
+        buffer.append(
+            (
+                municipalities.encode_arrow(batch.column("TILKOMMUNE")),
+                municipalities.encode_arrow(batch.column("FRAKOMMUNE")),
+                ages.encode_arrow(batch.column("ALDER")),
+                batch.column("INDHOLD").to_numpy(),
+            )
+        )
+        rows += batch.num_rows
+        if rows >= batch_size:
+            flush()
+            rows = 0
+    if buffer:
+        flush()
+
+    size = (len(municipalities.values), len(ages.values))
+    year = np.int16(os.path.basename(os.path.normpath(partition))[len("TID=") :])
+    ids = np.asarray(municipalities.values, dtype="int16")
+
+    def moved(name):
+        mun, age = np.nonzero(_grow(seen[name], size))
+        # ordered and typed like the groupby sums over the int32 counts
+        df = pd.DataFrame(
+            {
+                "municipality id": ids[mun],
+                "year": year,
+                "age": pd.Categorical.from_codes(age, categories=ages.values),
+                name: _grow(sums[name], size)[mun, age].round().astype("int32"),
+            }
+        )
+        return df.sort_values(["municipality id", "age"], kind="stable")
+
+    # the rest as in data.process_dk and data.dk_migration
+    df_dk = pd.merge(
+        moved("to"), moved("from"), on=["municipality id", "year", "age"], how="outer"
+    )
+    df_dk["age"] = data.single_ages(df_dk["age"])
+    df_dk["year"] = df_dk["year"].astype(str)
+    return df_dk[df_dk["age"] >= 0].reset_index(drop=True)
+
+
+def _grow(totals, size):
+    # zero padded to `size`
+    return np.pad(totals, [(0, n - m) for n, m in zip(size, totals.shape)])
@@ -0,0 +1,34 @@
+import contextlib
+import io
+import os
+import warnings
+
+import pytest
+
+from benchmarks import synthetic
+
+
+@pytest.fixture(scope="session")
+def inputs(tmp_path_factory):
+    # the update() inputs of the small synthetic scale
+    root = tmp_path_factory.mktemp("inputs")
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        synthetic.generate(root, **synthetic.SCALES["small"])
+    return root
+
+
+@pytest.fixture(scope="session")
+def built(inputs):
+    # inputs with the files update() writes, built in memory
+    from nordgeo import data
+
+    cwd = os.getcwd()
+    os.chdir(inputs)
+    try:
+        with warnings.catch_warnings(), contextlib.redirect_stdout(io.StringIO()):
+            warnings.simplefilter("ignore")
+            data.update()
+    finally:
+        os.chdir(cwd)
+    return inputs
@@ -0,0 +1,53 @@
+import os
+
+import pandas as pd
+import pytest
+
+from nordgeo import ages, data
+
+KEYS = ["municipality id", "year", "age group"]
+
+
+def _sorted(df):
+    return df.sort_values(KEYS, ignore_index=True)
+
+
+def test_regrouped_like_the_fact_table(built, monkeypatch):
+    monkeypatch.chdir(built)
+
+    expected = _sorted(data.load())
+    result = _sorted(data.load(age_groups=data.AGE_GROUPS))
+
+    pd.testing.assert_frame_equal(result, expected)
+
+
+def test_saved_without_temporary_files(built):
+    assert sorted(os.listdir(built / "ages")) == [
+        "axes.json",
+        "counts.npy",
+        "present.npy",
+    ]
+
+
+def test_total_over_all_ages(built, monkeypatch):
+    # the groups leave out the ages below 18, the total still counts them
+    monkeypatch.chdir(built)
+
+    expected = data.load().groupby(["municipality id", "year"])["value_total"].first()
+    result = data.load(age_groups={"students": 18, "adults": 30})
+
+    assert (result.groupby(["municipality id", "year"]).size() == 2).all()
+    totals = result.set_index(["municipality id", "year"])["value_total"]
+    pd.testing.assert_series_equal(
+        totals.groupby(level=[0, 1]).first(), expected, check_names=False
+    )
+    assert (result["value_grouped"] <= result["value_total"]).all()
+
+
+def test_empty_panel_is_rejected():
+    panel = pd.DataFrame(
+        columns=["municipality id", "year", "age", *ages.CHANNELS.values()]
+    )
+
+    with pytest.raises(ValueError, match="in scope"):
+        ages.build(panel)
@@ -0,0 +1,70 @@
+import shutil
+import warnings
+
+import pytest
+
+from nordgeo import build, data
+
+
+@pytest.fixture
+def root(inputs, tmp_path, monkeypatch):
+    # a copy of the inputs to add data to, built once
+    root = tmp_path / "root"
+    shutil.copytree(inputs, root)
+    monkeypatch.chdir(root)
+    update()
+    return root
+
+
+def update():
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        data.update()
+
+
+def built(capsys):
+    # the stages built since the last call, from the "Building ..." lines
+    out = capsys.readouterr().out
+    return {line.split()[1] for line in out.splitlines() if line.startswith("Building")}
+
+
+def test_unchanged_rerun_builds_nothing(root, capsys):
+    built(capsys)
+    update()
+
+    assert built(capsys) == set()
+
+
+def test_new_fly66_year_builds_only_what_depends_on_it(root, capsys):
+    partitions = root / "data" / "DK_data_migration"
+    shutil.copytree(partitions / "TID=2022", partitions / "TID=2023")
+    built(capsys)
+    update()
+
+    assert built(capsys) == {"dk_ages_2023", "df_dk", "migration", "gcr", "panel"}
+
+
+def test_file_inputs_by_content(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "input.csv").write_text("a")
+
+    def key(*inputs):
+        return build.Stage("stage", 1, None, *inputs).key
+
+    file, name = key(build.File("input.csv")), key("input.csv")
+    (tmp_path / "input.csv").write_text("b")
+
+    assert key(build.File("input.csv")) != file
+    # other strings count by value
+    assert key("input.csv") == name
+    assert key("DK") != key("SE")
+
+
+@pytest.mark.parametrize(
+    "scope", [{"regions": ["Hovedstaden", "Skaane"]}, {"countries": ["DK", "XX"]}]
+)
+def test_unknown_scope_is_rejected(inputs, scope):
+    shapefile = inputs / "data" / "mun_2022" / "nord_mun22_lcc.shp"
+
+    with pytest.raises(ValueError, match="Skaane|XX"):
+        data.municipalities(shapefile, **scope)
@@ -0,0 +1,25 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from nordgeo import cube
+
+
+def test_years_like_the_fact_table(built):
+    panel = cube.Cube.open(built / "cube")
+    facts = pd.read_parquet(built / "data.parquet", columns=["year"])
+
+    assert panel.axes["year"] == sorted(facts["year"].astype(str).unique())
+    year = panel.axes["year"][-1]
+    np.testing.assert_array_equal(
+        panel.sel(year=int(year), metric="population"),
+        panel.sel(year=year, metric="population"),
+    )
+
+
+def test_empty_facts_are_rejected(built):
+    facts = pd.read_parquet(built / "data.parquet")
+    mun = pd.read_parquet(built / "municipalities.parquet", columns=["municipality id"])
+
+    with pytest.raises(ValueError, match="in scope"):
+        cube.build(facts.iloc[:0], mun)
@@ -0,0 +1,43 @@
+import contextlib
+import io
+import math
+import shutil
+import warnings
+
+from benchmarks import pipeline
+from nordgeo import render
+
+
+def test_run_times_every_stage_and_figure(inputs, tmp_path):
+    root = tmp_path / "root"
+    shutil.copytree(inputs, root)
+    with warnings.catch_warnings(), contextlib.redirect_stdout(io.StringIO()):
+        warnings.simplefilter("ignore")
+        timings = pipeline.run(root, repeat=1)
+
+    assert {"update/total", "update/cube", "update/ages", "update/rollups"} <= set(
+        timings
+    )
+    assert {"load", "load/cohorts", "plot data/population_dynamics"} <= set(timings)
+    figures = {name for name in timings if name.startswith("plot/")}
+    assert {f"plot/{module}.{f.__name__}" for module, f in render.plots()} <= {
+        name.split("-")[0] for name in figures
+    }
+
+
+def test_compare_fails_on_missing_benchmarks(capsys):
+    baseline = {"load": 1.0, "update/total": 2.0}
+
+    slower = pipeline.compare({"load": 1.0}, baseline, tolerance=1.25)
+
+    assert list(slower) == ["update/total"]
+    assert math.isnan(slower["update/total"])
+    assert "MISSING" in capsys.readouterr().out
+
+
+def test_compare_fails_on_slower_benchmarks(capsys):
+    baseline = {"load": 1.0, "update/total": 2.0}
+
+    slower = pipeline.compare({"load": 2.0, "update/total": 2.0}, baseline, 1.25)
+
+    assert slower == {"load": 2.0}
@@ -0,0 +1,30 @@
+import pytest
+
+from nordgeo import geometry, rollup
+from nordgeo.plots import population_dynamics
+
+
+def test_classes_keyed_by_municipality_id(built, monkeypatch):
+    monkeypatch.chdir(built)
+
+    bar_chart, choropleth = population_dynamics.classes(interactive=False)
+
+    ids = {feature["id"] for feature in geometry.geojson(zoom=6)["features"]}
+    locations = [location for trace in choropleth.data for location in trace.locations]
+    assert len(locations) == len(set(locations))
+    assert set(locations) <= ids
+    assert sum(sum(trace.y) for trace in bar_chart.data) == len(locations)
+
+
+def test_classes_need_four_years(built, monkeypatch):
+    monkeypatch.chdir(built)
+    query = rollup.query
+
+    def three_years(*args, **kwargs):
+        df = query(*args, **kwargs)
+        return df[df["year"].isin(sorted(df["year"].unique())[:3])]
+
+    monkeypatch.setattr(rollup, "query", three_years)
+
+    with pytest.raises(ValueError, match="at least 4 years"):
+        population_dynamics.classes(interactive=False)
@@ -0,0 +1,22 @@
+import pandas as pd
+import pytest
+
+from nordgeo import data, rollup
+
+
+def test_query_sums_like_the_fact_table(built, monkeypatch):
+    monkeypatch.chdir(built)
+
+    expected = (
+        data.load().groupby(["country", "year"])["value_grouped"].sum().reset_index()
+    )
+    result = rollup.query(["country", "year"], ["value_grouped"])
+
+    pd.testing.assert_frame_equal(result, expected, check_dtype=False)
+
+
+def test_prev_needs_year(built, monkeypatch):
+    monkeypatch.chdir(built)
+
+    with pytest.raises(ValueError, match="year"):
+        rollup.query(["country"], ["value_grouped"], prev=True)
@@ -0,0 +1,86 @@
+import asyncio
+import http.client
+import json
+import threading
+
+import pytest
+
+from nordgeo import service
+
+
+@pytest.fixture
+def server(built, monkeypatch):
+    # the service on an ephemeral port, its event loop in a thread
+    monkeypatch.chdir(built)
+    loop = asyncio.new_event_loop()
+    server = loop.run_until_complete(service.Service().serve(port=0))
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    yield server.sockets[0].getsockname()[1]
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join()
+    server.close()
+    loop.run_until_complete(server.wait_closed())
+    loop.close()
+
+
+def get(port, target, headers=None):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    try:
+        conn.request("GET", target, headers=headers or {})
+        response = conn.getresponse()
+        return response.status, dict(response.getheaders()), response.read()
+    finally:
+        conn.close()
+
+
+@pytest.mark.parametrize("target", list(service.ENDPOINTS))
+def test_endpoints(server, target):
+    status, headers, body = get(server, target)
+
+    assert status == 200
+    assert headers["Content-Type"] == "application/json"
+    assert json.loads(body)
+
+
+def test_etag_revalidation(server):
+    target = "/metrics?metric=value_total"
+    status, headers, body = get(server, target)
+    assert status == 200
+
+    status, again, body = get(server, target, {"If-None-Match": headers["ETag"]})
+    assert status == 304
+    assert again["ETag"] == headers["ETag"]
+    assert body == b""
+
+    # other queries have other tags
+    status, other, _ = get(server, "/metrics", {"If-None-Match": headers["ETag"]})
+    assert status == 200
+    assert other["ETag"] != headers["ETag"]
+
+
+@pytest.mark.parametrize(
+    "target", ["/metrics?metric=unknown", "/geojson?zoom=far", "/geojson?scale=2"]
+)
+def test_bad_requests(server, target):
+    status, _, body = get(server, target)
+
+    assert status == 400
+    assert "error" in json.loads(body)
+
+
+def test_unknown_path(server):
+    assert get(server, "/unknown")[0] == 404
+
+
+def test_failures_are_answered(server, monkeypatch):
+    def failing():
+        raise FileNotFoundError("data.parquet")
+
+    monkeypatch.setitem(service.ENDPOINTS, "/failing", failing)
+    status, _, body = get(server, "/failing")
+
+    assert status == 500
+    assert "FileNotFoundError" in json.loads(body)["error"]
+    # the service keeps serving
+    assert get(server, "/population-dynamics")[0] == 200
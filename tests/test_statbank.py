@@ -0,0 +1,132 @@
+import collections
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+import pandas as pd
+import pytest
+
+from nordgeo import statbank
+
+REGIONS = [101, 147, 155, 185, 165, 151]
+
+
+class StubStatBank:
+    """Local stand-in for the StatBank API serving FLY66 as CSV.
+
+    Every query is answered with `failures[query]` error statuses first, in
+    order, then with one row per (to, from, year) of the query.
+    """
+
+    def __init__(self):
+        self.requests = collections.Counter()
+        self.failures = collections.defaultdict(list)
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                url = urlsplit(self.path)
+                stub.requests[url.query] += 1
+                if stub.failures[url.query]:
+                    self.reply(stub.failures[url.query].pop(0), "busy")
+                    return
+                query = dict(parse_qsl(url.query))
+                rows = [
+                    f"{to};{from_};20 år;{year};1"
+                    for to in query["TILKOMMUNE"].split(",")
+                    for from_ in query["FRAKOMMUNE"].split(",")
+                    for year in query["Tid"].split(",")
+                ]
+                self.reply(
+                    200, "\n".join(["TILKOMMUNE;FRAKOMMUNE;ALDER;TID;INDHOLD", *rows])
+                )
+
+            def reply(self, status, text):
+                body = text.encode("UTF-8")
+                self.send_response(status)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/v1/data"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def client(self, retries=2):
+        return statbank.StatBankClient(self.url, retries=retries, backoff=0)
+
+
+@pytest.fixture
+def stub():
+    stub = StubStatBank()
+    yield stub
+    stub.server.shutdown()
+    stub.server.server_close()
+
+
+def fetch(stub, path, **kwargs):
+    kwargs = {"regions": REGIONS, "years": [2018, 2019], "parts": 2, **kwargs}
+    return statbank.fetch_fly66(
+        str(path), workers=2, client=kwargs.pop("client", stub.client()), **kwargs
+    )
+
+
+def test_chunks_cover_every_pair_once(stub, tmp_path):
+    paths = fetch(stub, tmp_path)
+
+    assert len(paths) == 4
+    assert all(os.path.exists(path) for path in paths)
+    df = pd.concat(map(statbank.read_chunk, paths))
+    assert len(df) == len(REGIONS) ** 2 * 2
+    assert not df.duplicated(["TILKOMMUNE", "FRAKOMMUNE", "TID"]).any()
+    assert sum(stub.requests.values()) == 4
+
+
+def test_retries_throttled_and_unavailable(stub, tmp_path):
+    query = statbank.fly66_query(["101", "147", "155"], ["101", "147", "155"], [2018])
+    stub.failures[query] = [429, 503]
+
+    paths = fetch(stub, tmp_path, years=[2018])
+
+    assert stub.requests[query] == 3
+    assert len(statbank.read_chunk(paths[0])) == 9
+
+
+def test_gives_up_after_retries(stub, tmp_path):
+    query = statbank.fly66_query(["101", "147", "155"], ["101", "147", "155"], [2018])
+    stub.failures[query] = [503] * 3
+
+    with pytest.raises(statbank.StatBankError):
+        fetch(stub, tmp_path, years=[2018], client=stub.client(retries=1))
+    assert stub.requests[query] == 2
+    assert len(os.listdir(tmp_path)) == 3
+
+
+def test_resume_fetches_only_missing_chunks(stub, tmp_path):
+    query = statbank.fly66_query(["101", "147", "155"], ["101", "147", "155"], [2018])
+    stub.failures[query] = [503]
+    with pytest.raises(statbank.StatBankError):
+        fetch(stub, tmp_path, years=[2018], client=stub.client(retries=0))
+
+    stub.requests.clear()
+    paths = fetch(stub, tmp_path, years=[2018])
+
+    assert dict(stub.requests) == {query: 1}
+    assert len(paths) == 4
+
+
+def test_checkpoints_of_other_queries_are_not_reused(stub, tmp_path):
+    fetch(stub, tmp_path, years=[2018])
+
+    stub.requests.clear()
+    paths = fetch(stub, tmp_path, years=[2023])
+
+    assert sum(stub.requests.values()) == 4
+    df = pd.concat(map(statbank.read_chunk, paths))
+    assert set(df["TID"]) == {2023}
@@ -0,0 +1,62 @@
+import contextlib
+import io
+import os
+import warnings
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from nordgeo import data
+
+
+@pytest.fixture(scope="module")
+def out_of_core(built):
+    # update(out_of_core=True) next to the in-memory build of `built`
+    cwd = os.getcwd()
+    os.chdir(built)
+    os.makedirs("stream", exist_ok=True)
+    try:
+        with warnings.catch_warnings(), contextlib.redirect_stdout(io.StringIO()):
+            warnings.simplefilter("ignore")
+            data.update(
+                target_file="stream/data.parquet",
+                geometry_file="stream/municipalities.parquet",
+                cube_dir="stream/cube",
+                age_dir="stream/ages",
+                rollup_dir="stream/rollups",
+                out_of_core=True,
+            )
+    finally:
+        os.chdir(cwd)
+    return built
+
+
+@pytest.mark.parametrize("name", ["data.parquet", "municipalities.parquet"])
+def test_same_tables(out_of_core, name):
+    expected = pd.read_parquet(out_of_core / name)
+    result = pd.read_parquet(out_of_core / "stream" / name)
+
+    pd.testing.assert_frame_equal(result, expected)
+
+
+@pytest.mark.parametrize("store", ["cube", "ages", "rollups"])
+def test_same_stores(out_of_core, store):
+    expected = sorted(os.listdir(out_of_core / store))
+    assert sorted(os.listdir(out_of_core / "stream" / store)) == expected
+
+    for name in expected:
+        a, b = out_of_core / store / name, out_of_core / "stream" / store / name
+        if name.endswith(".npy"):
+            np.testing.assert_array_equal(np.load(b), np.load(a))
+        elif name.endswith(".parquet"):
+            pd.testing.assert_frame_equal(pd.read_parquet(b), pd.read_parquet(a))
+
+
+def test_stages_cached_apart(out_of_core):
+    stages = {name.rsplit("-", 1)[0] for name in os.listdir(out_of_core / "data/cache")}
+
+    # only FLY66 is streamed, the other stages are shared with the pandas build
+    assert {"ages", "se_ages"} <= stages
+    assert not {"ages_stream", "se_ages_stream"} & stages
+    assert any(stage.startswith("dk_ages_stream_") for stage in stages)